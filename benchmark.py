@@ -0,0 +1,197 @@
+"""Benchmarks of the co-simulation on synthetic radial feeders and horizons.
+
+Every case (number of nodes, horizon in days and time step) runs in a fresh worker process, so the peak RSS is that of
+the case alone. A case times:
+  - the grid model on its own (`ElectricGridEngine`, one power flow per step);
+  - a full `Manager.run_simulation`, with a per-component breakdown from the profiler;
+  - the heat pump, room and EV models on their own.
+
+The results can be saved and compared against a saved baseline, e.g.:
+    python benchmark.py --nodes 95,500 --days 1,7 --save baseline.csv
+    python benchmark.py --nodes 95,500 --days 1,7 --compare baseline.csv
+"""
+import argparse
+import copy
+import itertools
+import os
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from cosim_framework import Manager, Model, generate_status_ensemble
+from event_log import QUIET, EventLog, set_event_log
+from ev import adjust_power
+from grid import ElectricGridEngine
+from heat_pump import heat_pump_function
+from load_configurations import load_configuration_files
+from profiling import Profiler
+from room import RoomFunction
+from sweep import build_models
+
+BENCHMARK_KEYS = ["nodes", "days", "delta_t"]
+
+
+def generate_radial_feeder(num_nodes: int, seed: int = 0) -> pd.DataFrame:
+    """Generate a random radial feeder with nodes 1 (the slack node) to `num_nodes`, in the grid topology format.
+
+    The line impedances are scaled down for large feeders, so the voltages stay in a realistic range.
+    """
+    rng = np.random.default_rng(seed)
+    to_nodes = np.arange(2, num_nodes + 1)
+    # Connect every node to a random earlier node (a random recursive tree, with a depth growing with log(num_nodes))
+    from_nodes = rng.integers(1, to_nodes)
+    impedance_scale = min(1.0, 95 / num_nodes)
+    resistance = rng.uniform(0.01, 0.05, size=len(to_nodes)) * impedance_scale
+    return pd.DataFrame({
+        "FROM": from_nodes,
+        "TO": to_nodes,
+        "Raa": resistance,
+        "Xaa": resistance * rng.uniform(0.1, 0.3, size=len(to_nodes)),
+        "Imax": np.full(len(to_nodes), 300.0),
+    })
+
+
+def generate_active_power(num_consumers: int, days: int, delta_t: int, seed: int = 0) -> pd.DataFrame:
+    """Generate active power profiles [kW] of all consumers in the format of the active power datasets."""
+    rng = np.random.default_rng(seed)
+    num_steps = days * 1440 // delta_t
+    index = pd.date_range("2025-01-01", periods=num_steps, freq=f"{delta_t}min", name="snapshots")
+    minute_of_day = (index.hour * 60 + index.minute).to_numpy()
+    daily_profile = 0.6 + 0.4 * np.sin(2 * np.pi * minute_of_day / 1440)[:, np.newaxis]
+    active_power = daily_profile * rng.uniform(0.3, 1.2, size=(num_steps, num_consumers))
+    columns = [f"Customer_{consumer} (kW)" for consumer in range(1, num_consumers + 1)]
+    return pd.DataFrame(active_power, index=index, columns=columns)
+
+
+def run_case(case: dict) -> dict:
+    """Run one benchmark case. Meant to be run in a fresh worker process."""
+    set_event_log(EventLog(QUIET))
+    nodes, days, delta_t = case["nodes"], case["days"], case["delta_t"]
+    row = dict(case)
+    try:
+        with tempfile.TemporaryDirectory() as folder_path:
+            grid_topology = generate_radial_feeder(nodes)
+            active_power_df = generate_active_power(nodes, days, delta_t)
+            grid_topology_path = os.path.join(folder_path, "grid_topology.csv")
+            grid_topology.to_csv(grid_topology_path, index=False)
+
+            settings_configuration = copy.deepcopy(case["settings_configuration"])
+            settings_configuration['InitializationSettings']['time'].update(
+                {"start_time": 0, "end_time": days * 1440, "delta_t": delta_t},
+            )
+            settings_configuration['InitializationSettings']['grid_topology'] = grid_topology_path
+            smart_consumer_names = [f"Customer_{consumer}" for consumer in range(nodes, max(nodes - 28, 1), -1)]
+
+            row.update(benchmark_grid(active_power_df, grid_topology, smart_consumer_names))
+            row.update(benchmark_simulation(
+                active_power_df, settings_configuration, case["controller_configuration"], smart_consumer_names,
+            ))
+            row.update(benchmark_models(settings_configuration, len(active_power_df)))
+    except Exception as e:
+        row["error"] = repr(e)
+
+    row["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    del row["settings_configuration"], row["controller_configuration"]
+    return row
+
+
+def benchmark_grid(active_power_df: pd.DataFrame, grid_topology: pd.DataFrame, smart_consumer_names: list) -> dict:
+    """Time the grid model on its own, with a fixed smart consumer setpoint."""
+    grid_engine = ElectricGridEngine(smart_consumer_names)
+    start_time = time.perf_counter()
+    for time_step in active_power_df.index:
+        grid_engine(active_power_df, 5000, grid_topology, time_step)
+    run_time = time.perf_counter() - start_time
+    return {"grid_steps_per_s": len(active_power_df) / run_time}
+
+
+def benchmark_simulation(
+    active_power_df: pd.DataFrame,
+    settings_configuration: dict,
+    controller_configuration: dict,
+    smart_consumer_names: list,
+) -> dict:
+    """Time a full co-simulation, with the time spent per model from the profiler."""
+    models = build_models(settings_configuration, controller_configuration)
+    models[0] = Model(ElectricGridEngine(smart_consumer_names))
+    profiler = Profiler()
+    manager = Manager(models, settings_configuration, profiler=profiler)
+
+    delta_t = settings_configuration['InitializationSettings']['time']['delta_t']
+    num_days = len(active_power_df) * delta_t // 1440
+    status = generate_status_ensemble(delta_t, 1, np.random.default_rng(0), num_days=num_days)[0]
+    manager.run_simulation(active_power_df, status=status)
+
+    breakdown = profiler.summary()["total [s]"]
+    return {
+        "simulation_steps_per_s": profiler.steps_per_second,
+        "simulation_time_s": profiler.run_time,
+        **{f"{section}_s": total for section, total in breakdown.items()},
+    }
+
+
+def benchmark_models(settings_configuration: dict, num_steps: int) -> dict:
+    """Time the heat pump, room and EV models on their own."""
+    room = RoomFunction(settings_configuration)
+    ev_power = 0
+    start_time = time.perf_counter()
+    for time_step in range(num_steps):
+        heat_production = heat_pump_function(1000)
+        room(heat_production, 10.0)
+        ev_power = adjust_power(ev_power, time_step % 2)
+    run_time = time.perf_counter() - start_time
+    return {"models_steps_per_s": num_steps / run_time}
+
+
+def run_benchmarks(
+    nodes: list[int],
+    days: list[int],
+    delta_ts: list[int],
+    settings_configuration: dict,
+    controller_configuration: dict,
+) -> pd.DataFrame:
+    """Run all combinations of feeder size, horizon and time step, each in a fresh process."""
+    cases = [
+        {
+            "nodes": num_nodes, "days": num_days, "delta_t": delta_t,
+            "settings_configuration": settings_configuration, "controller_configuration": controller_configuration,
+        }
+        for num_nodes, num_days, delta_t in itertools.product(nodes, days, delta_ts)
+    ]
+    with Pool(processes=1, maxtasksperchild=1) as pool:
+        rows = pool.map(run_case, cases, chunksize=1)
+    return pd.DataFrame(rows).set_index(BENCHMARK_KEYS)
+
+
+def compare_benchmarks(results: pd.DataFrame, baseline: pd.DataFrame, tolerance: float = 0.1) -> pd.DataFrame:
+    """Compare the throughput against a baseline. A ratio below 1 - tolerance is flagged as a regression."""
+    columns = [column for column in results.columns if column.endswith("steps_per_s") and column in baseline.columns]
+    ratios = (results[columns] / baseline[columns].reindex(results.index)).add_suffix("_ratio")
+    ratios["regression"] = (ratios < 1 - tolerance).any(axis=1)
+    return ratios
+
+
+def main(args: argparse.Namespace):
+    """Run the benchmarks from the parsed command line arguments (see `python cli.py bench --help`)."""
+    controller_config, settings_configs = load_configuration_files('./configurations')  # The cases generate their data
+    benchmark_results = run_benchmarks(
+        args.nodes, args.days, args.delta_t, settings_configs["config 1"], controller_config,
+    )
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(benchmark_results.round(3))
+
+        if args.save is not None:
+            benchmark_results.to_csv(args.save)
+        if args.compare is not None:
+            baseline_results = pd.read_csv(args.compare, index_col=BENCHMARK_KEYS)
+            print(compare_benchmarks(benchmark_results, baseline_results, args.tolerance).round(3))
+
+
+if __name__ == "__main__":
+    from cli import main as cli_main
+    cli_main(["bench", *sys.argv[1:]])
@@ -0,0 +1,224 @@
+"""Command line interface of the co-simulation, e.g.:
+    python cli.py run --use-forecasted
+    python cli.py compare results/original results/forecasted
+    python cli.py sweep --max-workers 4 --grid ControllerSettings.actions.p_change_for_voltage=50,70
+    python cli.py ensemble --members 200 --seed 42
+    python cli.py bench --nodes 95,500 --days 1,7
+    python cli.py district --feeders configurations/district --partitions 4
+
+The arguments are parsed first; the modules of a subcommand (and heavy dependencies such as the power grid model and
+matplotlib) are only imported when that subcommand runs.
+"""
+import argparse
+import sys
+
+from event_log import VERBOSITY_LEVELS
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subparser per subcommand."""
+    parser = argparse.ArgumentParser(description="Co-simulation of an electricity grid with smart consumers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_run = subparsers.add_parser("run", help="Run the co-simulation.")
+    parser_run.add_argument(
+        "--use-forecasted", action="store_true", help="Use forecasted dataset instead of original dataset.",
+    )
+    parser_run.add_argument(
+        "--use-surrogate", action="store_true",
+        help="Predict small voltage changes with a voltage-sensitivity surrogate instead of full power flows.",
+    )
+    parser_run.add_argument(
+        "--households", type=int, default=None,
+        help="Simulate this many smart consumers at once, each with its own setpoint, room, EV and status.",
+    )
+    parser_run.add_argument(
+        "--results-folder", default=None,
+        help="Stream the results (including all consumer voltages and the user status) to this folder while running.",
+    )
+    parser_run.add_argument(
+        "--profile", default=None,
+        help="Time the models and write a summary (<PROFILE>.csv) and a trace file (<PROFILE>.json).",
+    )
+    parser_run.add_argument(
+        "--verbosity", choices=list(VERBOSITY_LEVELS), default="info",
+        help="Log nothing, only controller interventions (events), also run start/end (info), or every step (debug).",
+    )
+    parser_run.add_argument("--log-file", default=None, help="Write the event log to this file as JSON lines.")
+    parser_run.add_argument(
+        "--checkpoint-every", type=int, default=None,
+        help="Take a checkpoint of the original simulation every this many time steps.",
+    )
+    parser_run.add_argument(
+        "--checkpoint-folder", default=None,
+        help="Save the checkpoints to this folder while running (checkpoint_<time step>.pkl). With --results-folder, "
+             "the checkpoints refer to the results streamed there instead of holding them.",
+    )
+    parser_run.add_argument("--resume", default=None, help="Resume the original simulation from this checkpoint file.")
+    parser_run.add_argument(
+        "--fork-at", type=int, default=None,
+        help="Fork the forecasted simulation from the original one at this time step, instead of rerunning it.",
+    )
+    parser_run.add_argument(
+        "--concurrent", action="store_true",
+        help="Run the power flow on a worker thread, concurrently with the thermal and EV models.",
+    )
+    parser_run.add_argument(
+        "--input-window-days", type=int, default=None,
+        help="Stream the dataset, user status and weather in windows of this many days, for long horizons.",
+    )
+    parser_run.add_argument(
+        "--seed", type=int, default=None, help="Seed of the occupancy pattern (the same for both datasets).",
+    )
+    parser_run.add_argument(
+        "--run-cache", default=None,
+        help="Load seeded runs with unchanged configurations, datasets and model code from this cache folder.",
+    )
+    parser_run.add_argument(
+        "--run-cache-size", type=int, default=1024, help="Maximum size of the run cache [MB].",
+    )
+    parser_run.add_argument(
+        "--report", default=None,
+        help="With --use-forecasted, write the comparison statistics and plot to this folder instead of showing them.",
+    )
+    parser_run.set_defaults(handler=run_command)
+
+    parser_compare = subparsers.add_parser("compare", help="Compare two results folders written by `run`.")
+    parser_compare.add_argument("original", help="Results folder of the original simulation.")
+    parser_compare.add_argument("forecasted", help="Results folder of the forecasted simulation.")
+    parser_compare.add_argument("--plot", action="store_true", help="Plot the results.")
+    parser_compare.add_argument(
+        "--report", default=None, help="Write the comparison statistics and a decimated plot to this folder.",
+    )
+    parser_compare.set_defaults(handler=compare_command)
+
+    parser_sweep = subparsers.add_parser("sweep", help="Run a parallel sweep over the co-simulation configurations.")
+    parser_sweep.add_argument("--grid", action="append", help="Parameter values to sweep, as dotted.path=value1,value2.")
+    parser_sweep.add_argument("--max-workers", type=int, default=None, help="Maximum number of concurrent workers.")
+    parser_sweep.add_argument(
+        "--use-forecasted", action="store_true", help="Use forecasted dataset instead of original dataset.",
+    )
+    parser_sweep.add_argument("--use-surrogate", action="store_true", help="Use the voltage-sensitivity surrogate.")
+    parser_sweep.add_argument("--seed", type=int, default=0, help="Seed of the occupancy pattern.")
+    parser_sweep.add_argument("--output", default="sweep_results.csv", help="File to write the results table to.")
+    parser_sweep.set_defaults(handler=sweep_command)
+
+    parser_ensemble = subparsers.add_parser(
+        "ensemble", help="Run a Monte Carlo ensemble over random occupancy schedules.",
+    )
+    parser_ensemble.add_argument("--members", type=int, default=100, help="Number of ensemble members.")
+    parser_ensemble.add_argument("--seed", type=int, default=None, help="Seed of the occupancy schedules.")
+    parser_ensemble.add_argument("--config", default="config 1", help="Configuration to run.")
+    parser_ensemble.add_argument("--max-workers", type=int, default=None, help="Maximum number of concurrent workers.")
+    parser_ensemble.add_argument("--percentiles", default="5,50,95", help="Percentiles of the bands.")
+    parser_ensemble.add_argument(
+        "--use-forecasted", action="store_true", help="Use forecasted dataset instead of original dataset.",
+    )
+    parser_ensemble.add_argument("--use-surrogate", action="store_true", help="Use the voltage-sensitivity surrogate.")
+    parser_ensemble.add_argument(
+        "--output", default="ensemble_bands.csv", help="File to write the percentile bands to.",
+    )
+    parser_ensemble.set_defaults(handler=ensemble_command)
+
+    parser_bench = subparsers.add_parser(
+        "bench", help="Benchmark the co-simulation on synthetic feeders and horizons.",
+    )
+    parser_bench.add_argument("--nodes", type=parse_integers, default=[95], help="Feeder sizes, e.g. 95,500,2000.")
+    parser_bench.add_argument("--days", type=parse_integers, default=[1], help="Horizons in days, e.g. 1,31,365.")
+    parser_bench.add_argument("--delta-t", type=parse_integers, default=[15], help="Time steps in minutes, e.g. 1,15.")
+    parser_bench.add_argument("--save", default=None, help="Save the results as a baseline CSV file.")
+    parser_bench.add_argument("--compare", default=None, help="Compare the results with a baseline CSV file.")
+    parser_bench.add_argument(
+        "--tolerance", type=float, default=0.1, help="Relative slowdown flagged as a regression.",
+    )
+    parser_bench.set_defaults(handler=bench_command)
+
+    parser_district = subparsers.add_parser(
+        "district", help="Run a district of feeders, coupled at the substation, on a pool of processes.",
+    )
+    parser_district.add_argument(
+        "--feeders", required=True, help="Folder with one settings configuration (YAML file) per feeder.",
+    )
+    parser_district.add_argument(
+        "--partitions", type=int, default=None, help="Number of worker processes (default: one per CPU).",
+    )
+    parser_district.add_argument("--seed", type=int, default=0, help="Seed of the occupancy pattern.")
+    parser_district.add_argument(
+        "--no-load-voltage", type=float, default=1.0, help="Substation voltage without load [p.u.].",
+    )
+    parser_district.add_argument(
+        "--voltage-drop", type=float, default=0.01, help="Substation voltage drop per MW of district load [p.u./MW].",
+    )
+    parser_district.add_argument(
+        "--results-folder", default=None, help="Stream the results of every feeder to a subfolder of this folder.",
+    )
+    parser_district.add_argument(
+        "--output", default="district_substation.csv", help="File to write the substation load and voltage to.",
+    )
+    parser_district.set_defaults(handler=district_command)
+
+    return parser
+
+
+def run_command(args: argparse.Namespace):
+    """Run the co-simulation."""
+    from run_co_simulation import run
+    run(args)
+
+
+def compare_command(args: argparse.Namespace):
+    """Compare the results of two runs streamed to results folders."""
+    import yaml
+
+    from cosim_framework import compare_results, plot_results
+    from recorder import load_results
+    from reporting import write_report
+
+    with open('./configurations/controller_config.yaml', 'r') as file:
+        controller_configuration = yaml.safe_load(file)
+    original_results = load_results(args.original)
+    forecasted_results = load_results(args.forecasted)
+    compare_results(original_results, forecasted_results, controller_configuration)
+    if args.report is not None:
+        write_report(original_results, forecasted_results, args.report, controller_configuration)
+    if args.plot:
+        plot_results(original_results, forecasted_results)
+
+
+def sweep_command(args: argparse.Namespace):
+    """Run a parameter sweep."""
+    from sweep import main as sweep_main
+    sweep_main(args)
+
+
+def ensemble_command(args: argparse.Namespace):
+    """Run a Monte Carlo ensemble."""
+    from ensemble import main as ensemble_main
+    ensemble_main(args)
+
+
+def bench_command(args: argparse.Namespace):
+    """Run the benchmarks."""
+    from benchmark import main as benchmark_main
+    benchmark_main(args)
+
+
+def district_command(args: argparse.Namespace):
+    """Run a district of feeders."""
+    from district import main as district_main
+    district_main(args)
+
+
+def parse_integers(value: str) -> list[int]:
+    """Parse a comma-separated list of integers."""
+    return [int(item) for item in value.split(",")]
+
+
+def main(argv: list[str] = None):
+    """Parse the command line arguments and run the subcommand."""
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,4 +1,7 @@
 """Controller model."""
+import numpy as np
+
+from event_log import DEBUG, EVENTS, get_event_log
 
 
 def controller_function(
@@ -18,18 +21,31 @@ def controller_function(
     p_adjust_step_size_temp = controller_settings['ControllerSettings']['actions']['p_change_for_temperature']
 
     # Log current state of the system
-    print(f"Current power setpoint of the heat pump: {power_set_point_hp}")
-    print(f"Current grid voltage: {voltage}")
-    print(f"Current temperature: {temperature}")
+    event_log = get_event_log()
+    if event_log.enabled(DEBUG):
+        event_log.log(
+            DEBUG, "controller_state",
+            "Current power setpoint of the heat pump: {power_set_point_hp}\n"
+            "Current grid voltage: {voltage}\nCurrent temperature: {temperature}",
+            power_set_point_hp=power_set_point_hp, voltage=voltage, temperature=temperature,
+        )
 
     if status == 0:
         # Priority 1: Adjust power based on voltage limits
         if voltage < voltage_min:
             power_set_point_hp -= p_adjust_step_size_voltage
-            print(f"Voltage {voltage} too low, decreasing heat pump power setpoint (consumption) to correct voltage.")
+            event_log.log(
+                EVENTS, "voltage_too_low",
+                "Voltage {voltage} too low, decreasing heat pump power setpoint (consumption) to correct voltage.",
+                voltage=voltage, power_set_point_hp=power_set_point_hp,
+            )
         elif voltage > voltage_max:
             power_set_point_hp += p_adjust_step_size_voltage
-            print(f"Voltage {voltage} too high, increasing heat pump power setpoint (consumption) to correct voltage.")
+            event_log.log(
+                EVENTS, "voltage_too_high",
+                "Voltage {voltage} too high, increasing heat pump power setpoint (consumption) to correct voltage.",
+                voltage=voltage, power_set_point_hp=power_set_point_hp,
+            )
 
         # Priority 2: Adjust power based on temperature needs (only if voltage is within limits)
         if voltage_min <= voltage <= voltage_max:
@@ -37,29 +53,110 @@ def controller_function(
                 power_set_point_hp -= p_adjust_step_size_temp
                 if power < 25000:  # Ensure power is below 25000 before increasing
                     power_set_point_hp += 500
-                print("Temperature is too high, reducing heat pump power setpoint to cool down.")
+                event_log.log(
+                    EVENTS, "temperature_too_high",
+                    "Temperature is too high, reducing heat pump power setpoint to cool down.",
+                    temperature=temperature, power_set_point_hp=power_set_point_hp,
+                )
             elif temperature < temp_min:
                 power_set_point_hp += p_adjust_step_size_temp
                 if power < 25000:  # Ensure power is below 25000 before increasing
                     power_set_point_hp += 500
-                print("Temperature is too low, increasing heat pump power setpoint to warm up.")
+                event_log.log(
+                    EVENTS, "temperature_too_low",
+                    "Temperature is too low, increasing heat pump power setpoint to warm up.",
+                    temperature=temperature, power_set_point_hp=power_set_point_hp,
+                )
 
     if status == 1:
         # Priority 1: Adjust power based on voltage limits
         if voltage < voltage_min:
             power_set_point_hp -= p_adjust_step_size_voltage
-            print(f"Voltage {voltage} too low, decreasing heat pump power setpoint (consumption) to correct voltage.")
+            event_log.log(
+                EVENTS, "voltage_too_low",
+                "Voltage {voltage} too low, decreasing heat pump power setpoint (consumption) to correct voltage.",
+                voltage=voltage, power_set_point_hp=power_set_point_hp,
+            )
         elif voltage > voltage_max:
             power_set_point_hp += p_adjust_step_size_voltage
-            print(f"Voltage {voltage} too high, increasing heat pump power setpoint (consumption) to correct voltage.")
+            event_log.log(
+                EVENTS, "voltage_too_high",
+                "Voltage {voltage} too high, increasing heat pump power setpoint (consumption) to correct voltage.",
+                voltage=voltage, power_set_point_hp=power_set_point_hp,
+            )
 
         # Priority 2: Adjust power based on temperature needs (only if voltage is within limits)
         if voltage_min <= voltage <= voltage_max:
             if temperature > 20:
                 power_set_point_hp -= p_adjust_step_size_temp
-                print("Temperature is too high, reducing heat pump power setpoint to cool down.")
+                event_log.log(
+                    EVENTS, "temperature_too_high",
+                    "Temperature is too high, reducing heat pump power setpoint to cool down.",
+                    temperature=temperature, power_set_point_hp=power_set_point_hp,
+                )
             elif temperature < 13:
                 power_set_point_hp += p_adjust_step_size_temp
-                print("Temperature is too low, increasing heat pump power setpoint to warm up.")
+                event_log.log(
+                    EVENTS, "temperature_too_low",
+                    "Temperature is too low, increasing heat pump power setpoint to warm up.",
+                    temperature=temperature, power_set_point_hp=power_set_point_hp,
+                )
 
     return power_set_point_hp
+
+
+def controller_function_array(
+    power_set_point_hp: np.ndarray,
+    status: np.ndarray,
+    power: np.ndarray,
+    voltage: np.ndarray,
+    temperature: np.ndarray,
+    controller_settings: dict,
+) -> np.ndarray:
+    """The controller of `controller_function`, applied to many households at once.
+
+    All inputs are arrays with one entry per household; the same rules are applied element-wise.
+    """
+    # Boundary conditions
+    voltage_min = controller_settings['ControllerSettings']['boundary_conditions']['minimum_voltage']
+    voltage_max = controller_settings['ControllerSettings']['boundary_conditions']['maximum_voltage']
+    temp_min = controller_settings['ControllerSettings']['boundary_conditions']['minimum_temperature']
+    temp_max = controller_settings['ControllerSettings']['boundary_conditions']['maximum_temperature']
+
+    p_adjust_step_size_voltage = controller_settings['ControllerSettings']['actions']['p_change_for_voltage']
+    p_adjust_step_size_temp = controller_settings['ControllerSettings']['actions']['p_change_for_temperature']
+
+    home = status == 0
+    controlled = home | (status == 1)
+
+    # Priority 1: Adjust power based on voltage limits
+    voltage_too_low = controlled & (voltage < voltage_min)
+    voltage_too_high = controlled & (voltage > voltage_max)
+
+    # Priority 2: Adjust power based on temperature needs (only if voltage is within limits), with the temperature
+    # limits of the configuration at home and fixed limits when the user is away
+    voltage_within_limits = controlled & (voltage_min <= voltage) & (voltage <= voltage_max)
+    temperature_too_high = voltage_within_limits & (temperature > np.where(home, temp_max, 20))
+    temperature_too_low = voltage_within_limits & ~temperature_too_high & (temperature < np.where(home, temp_min, 13))
+    ev_charging_allowance = home & (temperature_too_high | temperature_too_low) & (power < 25000)
+
+    event_log = get_event_log()
+    if event_log.enabled(EVENTS):
+        corrections = {
+            "voltage_too_low": voltage_too_low,
+            "voltage_too_high": voltage_too_high,
+            "temperature_too_high": temperature_too_high,
+            "temperature_too_low": temperature_too_low,
+        }
+        for event, households in corrections.items():
+            if households.any():
+                event_log.log(EVENTS, event, households=np.flatnonzero(households))
+
+    return (
+        power_set_point_hp
+        - p_adjust_step_size_voltage * voltage_too_low
+        + p_adjust_step_size_voltage * voltage_too_high
+        - p_adjust_step_size_temp * temperature_too_high
+        + p_adjust_step_size_temp * temperature_too_low
+        + 500 * ev_charging_allowance
+    )
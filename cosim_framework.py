@@ -1,156 +1,577 @@
 """Co-simulation framework module. Contains Model and Manager classes for running the co-simulation."""
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-
-
-def generate_daily_status(delta_t: int) -> np.ndarray:
-    """
-    Generates a status array where:
-      - 1 = user is away (cannot charge EV, different temperature limits).
-      - 0 = user is at home.
+import copy
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 
-    Args:
-        delta_t (int): Time step in minutes.
+import numpy as np
 
-    Returns:
-        np.ndarray: Status array for the entire simulation (31 days).
-    """
-    num_days = 31
-    total_minutes = num_days * 1440  # 31 days * 1440 minutes per day
-    time_steps = total_minutes // delta_t  # Convert to simulation steps
+from event_log import DEBUG, INFO, get_event_log
+from input_stream import ExogenousInputStream, generate_daily_status, generate_status_ensemble  # noqa: F401
+from profiling import Profiler
+from recorder import ResultsRecorder
 
-    status = np.zeros(time_steps, dtype=int)  # Default: user is home
 
-    for day in range(num_days):
-        start_of_day = day * 1440  # Start minute of the day
+HOLD_MODES = ("sample", "linear")
 
-        # Generate random leave and return times
-        leave_time = start_of_day + np.random.randint(300, 360)  # Leave (5 AM - 6 AM)
-        return_time = start_of_day + np.random.randint(1020, 1080)  # Return (5 PM - 6 PM)
+# Models whose outputs of the same time step every model depends on, as wired by the Manager. The grid, heat pump and
+# EV models only depend on the setpoint and status of the previous step.
+MODEL_DEPENDENCIES = {
+    "electric_grid": [],
+    "heat_pump": [],
+    "room": ["heat_pump"],
+    "ev": [],
+    "controller": ["electric_grid", "room", "ev"],
+}
 
-        # Convert to time step indices
-        leave_step = min(leave_time // delta_t, time_steps - 1)
-        return_step = min(return_time // delta_t, time_steps - 1)
 
-        # Set status to 1 (away) in this period
-        status[leave_step:return_step] = 1
+def independent_model_groups(dependencies: dict[str, list[str]], join: str) -> list[list[str]]:
+    """Group the models that run before the `join` model into groups that do not depend on each other.
 
-    return status
+    The models within a group depend on each other and are listed in dependency order; different groups can run
+    concurrently.
+    """
+    roles = [role for role in dependencies if role != join]
+    group_of = {role: {role} for role in roles}
+    for role in roles:
+        for dependency in dependencies[role]:
+            merged = group_of[role] | group_of[dependency]
+            for member in merged:
+                group_of[member] = merged
+
+    groups = []
+    for role in roles:
+        if group_of[role] not in groups:
+            groups.append(group_of[role])
+
+    # Order every group so that dependencies come first
+    ordered_groups = []
+    for group in groups:
+        ordered, remaining = [], [role for role in roles if role in group]
+        while remaining:
+            ready = [role for role in remaining if all(dependency in ordered for dependency in dependencies[role])]
+            if not ready:
+                raise ValueError(f"The models {remaining} have circular dependencies.")
+            ordered.extend(ready)
+            remaining = [role for role in remaining if role not in ready]
+        ordered_groups.append(ordered)
+    return ordered_groups
+
+
+def per_household_values(value, num_households: int) -> np.ndarray:
+    """Broadcast a configuration value (a number or a list with one value per household) to an array."""
+    return np.broadcast_to(np.asarray(value, dtype=float), (num_households,)).copy()
+
+
+def save_checkpoint(checkpoint: dict, path: str):
+    """Save a checkpoint of a run (see `Manager.run_simulation`) to a file."""
+    with open(path + ".tmp", 'wb') as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def load_checkpoint(path: str) -> dict:
+    """Load a checkpoint saved with `save_checkpoint`."""
+    with open(path, 'rb') as file:
+        return pickle.load(file)
 
 
 class Model:
     """Wrapper class for modeling any physical process (e.g. power flow, heat production, etc.)."""
 
-    def __init__(self, process_model):
-        """Takes in the model of a physical process as a function or callable class."""
+    def __init__(
+        self,
+        process_model,
+        name: str = None,
+        period: int = None,
+        hold: str = "sample",
+        batch_model=None,
+        numeric_output: bool = True,
+    ):
+        """Takes in the model of a physical process as a function or callable class.
+
+        Args:
+            process_model: Function or callable class of the physical process.
+            name (str): Name of the model, e.g. in the profiler.
+            period (int): Minutes between updates of the model, a multiple of the simulation time step (default: every
+                time step).
+            hold (str): Output between updates: "sample" holds the last output, "linear" extrapolates the last two
+                outputs (only for numeric outputs).
+            batch_model: Optional function computing the outputs of all time steps at once from the input arrays of
+                the whole horizon (see `calculate_batch`), for models that are not coupled to the others.
+            numeric_output (bool): Whether the output is a number or array, which the "linear" hold needs (not e.g. a
+                dictionary).
+        """
         if not callable(process_model):
             raise ValueError("The process must be a function or callable class.")
+        if hold not in HOLD_MODES:
+            raise ValueError(f"Unknown hold mode {hold}, expected one of {HOLD_MODES}.")
         self.process_model = process_model
+        self.name = name
+        self.period = period
+        self.hold = hold
+        self.batch_model = batch_model
+        self.numeric_output = numeric_output
+        self.profiler = None  # Set by the Manager to time the calls
+
+        # Schedule of a simulation run, set by `schedule`
+        self.update_steps = 1  # Time steps between updates
+        self.output = None
+        self.previous_output = None
+        self.updates = 0
 
     def calculate(self, *args) -> float:
         """Call the process function to perform calculations on an arbitrary number of inputs."""
-        return self.process_model(*args)
+        if self.profiler is None:
+            return self.process_model(*args)
+        return self.profiler.timed(self.name, self.process_model, *args)
+
+    def calculate_batch(self, *args) -> np.ndarray:
+        """Call the batch function to calculate the outputs of all time steps at once."""
+        if self.batch_model is None:
+            raise ValueError(f"Model {self.name} has no batch model.")
+        if self.profiler is None:
+            return self.batch_model(*args)
+        return self.profiler.timed(f"{self.name}.batch", self.batch_model, *args)
+
+    def schedule(self, delta_t: int):
+        """Prepare a simulation run with the given time step [minutes]: derive the update steps and clear the outputs.
+
+        A process model with a `set_period` method is told the update period, e.g. to integrate with that step.
+        """
+        period = self.period if self.period is not None else delta_t
+        if period <= 0 or period % delta_t != 0:
+            raise ValueError(f"Period {period} of model {self.name} is not a multiple of the time step {delta_t}.")
+        if self.hold not in HOLD_MODES:
+            raise ValueError(f"Unknown hold mode {self.hold} of model {self.name}, expected one of {HOLD_MODES}.")
+        if self.hold == "linear" and not self.numeric_output:
+            raise ValueError(f"Model {self.name} has a non-numeric output, which cannot be held linearly.")
+        self.update_steps = period // delta_t
+        if hasattr(self.process_model, "set_period"):
+            self.process_model.set_period(period)
+        self.output = None
+        self.previous_output = None
+        self.updates = 0
+
+    def calculate_at(self, time_step: int, *args):
+        """Calculate at the update steps of the model, and hold (or extrapolate) the last output in between."""
+        if self.update_steps == 1:
+            self.updates += 1
+            return self.calculate(*args)
+
+        steps_since_update = time_step % self.update_steps
+        if steps_since_update == 0 or self.output is None:
+            self.previous_output, self.output = self.output, self.calculate(*args)
+            self.updates += 1
+            return self.output
+        if self.hold == "linear" and self.previous_output is not None:
+            return self.output + (self.output - self.previous_output) * steps_since_update / self.update_steps
+        return self.output
+
+    def get_state(self) -> dict:
+        """Get the held outputs and, if the process model has state (a `get_state` method), its state."""
+        state = copy.deepcopy({"output": self.output, "previous_output": self.previous_output, "updates": self.updates})
+        if hasattr(self.process_model, "get_state"):
+            state["process_model"] = self.process_model.get_state()
+        return state
+
+    def set_state(self, state: dict):
+        """Restore a state from `get_state`."""
+        state = copy.deepcopy(state)
+        self.output, self.previous_output, self.updates = state["output"], state["previous_output"], state["updates"]
+        if "process_model" in state:
+            self.process_model.set_state(state["process_model"])
 
 
 class Manager:
     """The orchestrator manager for managing the data exchanged between the coupled models."""
 
-    def __init__(self, models: list[Model], settings_configuration: dict):
+    def __init__(
+        self,
+        models: list[Model],
+        settings_configuration: dict,
+        num_households: int = None,
+        results_folder_path: str = None,
+        chunk_size: int = 1024,
+        record_consumer_voltages: bool = False,
+        record_status: bool = False,
+        profiler: Profiler = None,
+        checkpoint_folder_path: str = None,
+        concurrent: bool = False,
+        input_window_days: int = None,
+    ):
+        """Wire the models together.
+
+        If `num_households` is given, all smart consumers are simulated at once: the models are called with arrays
+        holding one setpoint, temperature, EV power and status per household (see `RoomFunction(num_rooms=...)`,
+        `adjust_power_array` and `controller_function_array`), and the grid model returns one voltage per household.
+
+        The results are recorded in preallocated columns (see `ResultsRecorder`). With `results_folder_path`, they are
+        streamed to that folder in chunks of `chunk_size` time steps. The voltages of all consumers and the user
+        status can be recorded as extra signals.
+
+        With a `profiler`, the calls of every model (and the parts of the grid model) are timed.
+
+        With a `checkpoint_folder_path`, every checkpoint is also saved to that folder as soon as it is taken, as
+        "checkpoint_<time step>.pkl", so an interrupted run can be resumed.
+
+        With `concurrent`, the models that do not depend on each other within a time step (see `MODEL_DEPENDENCIES`)
+        run concurrently: the grid model runs on a worker thread (the power flow releases the GIL) while the heat pump,
+        room and EV models run, and both are joined before the controller.
+
+        With `input_window_days`, the exogenous inputs (passive consumer power, user status and outside temperature)
+        are streamed in windows of that many days (see `ExogenousInputStream`) instead of being prepared for the whole
+        horizon, so that memory use does not grow with the horizon (record to a `results_folder_path` as well).
+        """
         self.models = models
         self.electric_grid = models[0]  # First model is the electric grid
         self.heat_pump = models[1]  # Second model is the heat pump
         self.room = models[2]  # Third model is the room
         self.ev = models[3]  # EV Model
         self.controller = models[-1]  # Last model is the controller
+        self.electric_grid.numeric_output = False  # The grid model returns a dictionary of voltages
         self.settings_configuration = settings_configuration
+        self.num_households = num_households
+        self.results_folder_path = results_folder_path
+        self.chunk_size = chunk_size
+        self.record_consumer_voltages = record_consumer_voltages
+        self.record_status = record_status
         self.results = None
-
-    def run_simulation(self, df):
-        temp_rise = np.linspace(0, 15, num=48, endpoint=True)
-        temp_fall = np.linspace(0, 15, num=48, endpoint=True)
-        temp_day = np.concatenate((temp_rise, temp_fall))
-
+        self.result_signals = None  # Signal metadata of the last run, e.g. the labels (see `ResultsRecorder.signals`)
+        self.checkpoints = {}  # Checkpoints of the last run by time step
+        self.checkpoint_folder_path = checkpoint_folder_path
+        self.input_window_days = input_window_days
+
+        self.concurrent = concurrent
+        if concurrent:
+            grid_group = next(
+                group for group in independent_model_groups(MODEL_DEPENDENCIES, "controller")
+                if "electric_grid" in group
+            )
+            if grid_group != ["electric_grid"]:
+                raise ValueError(f"The grid model cannot run concurrently, it is coupled to {grid_group}.")
+
+        # Optional multi-rate schedule of the configuration, overriding the periods and hold modes of the models
+        scheduling = settings_configuration['InitializationSettings'].get('scheduling') or {}
+        for role, model in self.model_roles().items():
+            model.name = model.name or role
+            model.period = (scheduling.get('model_periods') or {}).get(role) or model.period
+            model.hold = (scheduling.get('hold') or {}).get(role) or model.hold
+
+        self.profiler = profiler
+        if profiler is not None:
+            self.attach_profiler(profiler)
+
+    def attach_profiler(self, profiler: Profiler):
+        """Time the calls of all models with the profiler, named after their role unless they have a name."""
+        self.profiler = profiler
+        for role, model in self.model_roles().items():
+            model.name = model.name or role
+            model.profiler = profiler
+            if hasattr(model.process_model, "profiler"):
+                model.process_model.profiler = profiler  # Models that time their own parts
+
+    def model_roles(self) -> dict[str, Model]:
+        """Get the models by their role in the co-simulation."""
+        return {
+            "electric_grid": self.electric_grid,
+            "heat_pump": self.heat_pump,
+            "room": self.room,
+            "ev": self.ev,
+            "controller": self.controller,
+        }
+
+    def run_simulation(
+        self,
+        df,
+        status: np.ndarray = None,
+        checkpoint_steps: list[int] = (),
+        checkpoint: dict = None,
+        fork_steps: list[int] = (),
+    ):
+        """Run the co-simulation on the passive consumer dataset.
+
+        The simulation time step `delta_t` is the finest rate. Models with a longer period (see `Model`) are only
+        updated at their own rate and hold their last output in between. The passive consumer power is taken from the
+        dataset row at (or last before) the simulation time, and the outside temperature is interpolated in time.
+
+        The exogenous inputs are read per window of time steps (the whole horizon unless `input_window_days` is set,
+        see `ExogenousInputStream`). Signals that do not depend on the grid or the controller are computed per window
+        before its time steps: the outside temperature, and the EV power if the EV model has a batch model and runs
+        every time step.
+
+        A run can take checkpoints of its complete state before the given time steps (see `save_checkpoint`), and
+        continue from a checkpoint instead of the start. Only the latest checkpoint and those at `fork_steps` are kept
+        in `checkpoints`. The recorded results are not copied into a checkpoint: when they are streamed to a results
+        folder, a checkpoint only refers to the rows written there. Continuing with other models or
+        another dataset forks the run into a what-if branch that shares the recorded results before the checkpoint.
+        Grid models are not part of a checkpoint: they restart from an exact power flow.
+
+        Args:
+            df (pd.DataFrame): Active power of the passive consumers.
+            status (np.ndarray): User status per time step (default: a new random daily status, or the status of the
+                checkpoint), with one row per household if multiple households are simulated.
+            checkpoint_steps (list[int]): Time steps before which a checkpoint is taken.
+            checkpoint (dict): Checkpoint to continue from (of a run with the same time settings).
+            fork_steps (list[int]): Time steps of checkpoints to keep, e.g. to fork from (a checkpoint is taken there).
+        """
+        steps = self.simulation_steps(df, status, checkpoint_steps, checkpoint, fork_steps)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as stop:
+                return stop.value
+
+    def simulation_steps(
+        self,
+        df,
+        status: np.ndarray = None,
+        checkpoint_steps: list[int] = (),
+        checkpoint: dict = None,
+        fork_steps: list[int] = (),
+    ):
+        """Run the co-simulation one time step at a time (see `run_simulation` for the arguments).
+
+        A generator that yields every time step once it is simulated and returns the results, so that several runs can
+        be advanced in lockstep and exchange data between their steps (e.g. the feeders of a `district`).
+        """
         # Extract the relevant simulation parameters from the configuration
         config = self.settings_configuration
-        outside_temp = np.tile(temp_day, 31)
         config_id = config['InitializationSettings']['config_id']
         start_time = config['InitializationSettings']['time']['start_time']
         end_time = config['InitializationSettings']['time']['end_time']
         delta_t = config['InitializationSettings']['time']['delta_t']
 
         # Grid line data
-        grid_topology = pd.read_csv(config['InitializationSettings']['grid_topology'])
+        from dataset_cache import read_csv_cached  # Imports pandas, so only imported when a run starts
 
-        # Passive consumers
-        passive_consumer_power_setpoints = df
-        #passive_consumer_power_setpoints = pd.read_csv(
-        #    config['InitializationSettings']['passive_consumers_power_setpoints'], index_col="snapshots",
-        #    parse_dates=True,
-        #)
+        grid_topology = read_csv_cached(config['InitializationSettings']['grid_topology'])
 
         # Smart consumer
         hp_power_setpoint = config['InitializationSettings']['initial_conditions']['heat_pump']['power_set_point']
         room_temperature = config['InitializationSettings']['initial_conditions']['room']['temperature']
         ev_power = config['InitializationSettings']['initial_conditions']['ev']['power']  # Initialize once
-
-        # Initialize lists to store data for plotting
-        results = {
-            "times": [],
-            "smart_consumer_voltage": [],
-            "temperature": [],
-            "hp_power_setpoint": [],
-            "heat_production": [],
-            "ev_power": [],
-        } # Store status for plotting
-
-        print("===============================================================")
-        print(f"Starting simulation at time {start_time}, ending at {end_time}, with time step delta_t: {delta_t}\n")
-        print(
-            f"Initial heat pump power_setpoint: {hp_power_setpoint}\nInitial heat pump temperature: {room_temperature}\n")
-        print("===============================================================")
+        if self.num_households is not None:
+            # One value per household; the configuration holds either one value for all or a list of values
+            hp_power_setpoint = per_household_values(hp_power_setpoint, self.num_households)
+            room_temperature = per_household_values(room_temperature, self.num_households)
+            ev_power = per_household_values(ev_power, self.num_households)
+
+        event_log = get_event_log()
+        event_log.log(
+            INFO, "simulation_start",
+            "===============================================================\n"
+            "Starting simulation at time {start_time}, ending at {end_time}, with time step delta_t: {delta_t}\n\n"
+            "Initial heat pump power_setpoint: {hp_power_setpoint}\n"
+            "Initial heat pump temperature: {room_temperature}\n\n"
+            "===============================================================",
+            config_id=config_id, start_time=start_time, end_time=end_time, delta_t=delta_t,
+            hp_power_setpoint=hp_power_setpoint, room_temperature=room_temperature,
+        )
 
         time_steps = int((end_time - start_time) / delta_t)
-        status = generate_daily_status(delta_t)
-
-        for time_step in range(time_steps):
-            time_clock = start_time + time_step * delta_t
-            current_status = status[time_step]
-
-            # Map time step to the corresponding index in the power setpoint dataframe
-            corresponding_time_in_dataframe = passive_consumer_power_setpoints.index[time_step]
-            print(f"Time step {corresponding_time_in_dataframe} | Simulation time clock: {time_clock:.2f}")
-
-            # Compute new state based on the current power setpoint of the heat pump
-            all_consumer_voltages = self.electric_grid.calculate(
-                passive_consumer_power_setpoints, hp_power_setpoint, grid_topology, corresponding_time_in_dataframe,
-            )
-            smart_consumer_voltage = all_consumer_voltages["consumers"]["smart_consumer"]
-
-            # Update EV power, ensuring it accumulates over time
-
-            heat_production_from_hp = self.heat_pump.calculate(hp_power_setpoint)
-            room_temperature = self.room.calculate(heat_production_from_hp, outside_temp[time_step])
-            ev_power = self.ev.calculate(ev_power, current_status)
-            # Adjust power setpoint using the controller
-            hp_power_setpoint = self.controller.calculate(
-                hp_power_setpoint, current_status, ev_power, smart_consumer_voltage, room_temperature
+        for model in self.models:
+            model.schedule(delta_t)
+        self.checkpoints = {}
+        fork_steps = set(fork_steps)
+        checkpoint_steps = set(checkpoint_steps) | fork_steps
+        latest_checkpoint_step = None
+
+        # Exogenous inputs, read per window (the status is generated per day unless given, or of the checkpoint)
+        status_seed = None
+        if status is None and checkpoint is not None:
+            status, status_seed = checkpoint["status"], checkpoint.get("status_seed")
+        window_steps = None
+        if self.input_window_days is not None:
+            window_steps = self.input_window_days * 1440 // delta_t
+        inputs = ExogenousInputStream(
+            df, delta_t, time_steps, window_steps, status, self.num_households, status_seed,
+            read_ahead=window_steps is not None and window_steps < time_steps,
+        )
+
+        # Initialize the columns to store data for plotting, with one value per household if there are many
+        recorder = ResultsRecorder(time_steps, self.results_folder_path, self.chunk_size)
+        household_shape = () if self.num_households is None else (self.num_households,)
+        signals = {"times": ((), np.float64)}
+        for signal in ["smart_consumer_voltage", "temperature", "hp_power_setpoint", "heat_production", "ev_power"]:
+            signals[signal] = (household_shape, np.float64)
+        if self.record_status:
+            signals["status"] = (household_shape, np.int8)
+
+        first_time_step = 0
+        if checkpoint is None:
+            for signal, (shape, dtype) in signals.items():
+                recorder.register(signal, shape, dtype)
+        else:
+            # Continue from the checkpoint: restore the recorded results, the state of the models and the RNG.
+            if checkpoint["time_steps"] != time_steps or checkpoint["delta_t"] != delta_t:
+                raise ValueError("The checkpoint is of a run with other time settings.")
+            first_time_step = checkpoint["time_step"]
+            expected_signals = set(signals)
+            if self.record_consumer_voltages and first_time_step > 0:
+                expected_signals.add("consumer_voltages")
+            if set(checkpoint["recorder"]["signals"]) != expected_signals:
+                raise ValueError("The checkpoint did not record the same signals as this run.")
+            recorder.set_state(checkpoint["recorder"])
+            hp_power_setpoint = copy.deepcopy(checkpoint["hp_power_setpoint"])
+            room_temperature = copy.deepcopy(checkpoint["room_temperature"])
+            ev_power = copy.deepcopy(checkpoint["ev_power"])
+            for role, model in self.model_roles().items():
+                if role in checkpoint["models"]:
+                    model.set_state(checkpoint["models"][role])
+            np.random.set_state(checkpoint["rng_state"])
+
+        windows = inputs.windows(first_time_step)
+        window = None
+        grid_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grid") if self.concurrent else None
+
+        # The grid model counts over all its runs (and shares the power flow cache), so the run reports the difference
+        grid_model = self.electric_grid.process_model
+        grid_statistics_at_start = grid_model.statistics() if hasattr(grid_model, "statistics") else {}
+        run_start_time = perf_counter()
+        try:
+            for time_step in range(first_time_step, time_steps):
+                if window is None or time_step == window["end_step"]:
+                    window = next(windows)
+                    passive_consumer_power_setpoints = window["active_power"]
+                    # EV power trajectory of the window (it only depends on the status)
+                    ev_power_trajectory = None
+                    if self.ev.batch_model is not None and self.ev.update_steps == 1:
+                        ev_power_trajectory = self.ev.calculate_batch(ev_power, window["status"])
+                        self.ev.updates += ev_power_trajectory.shape[-1]
+                window_step = time_step - window["start_step"]
+
+                if time_step in checkpoint_steps:
+                    if latest_checkpoint_step is not None and latest_checkpoint_step not in fork_steps:
+                        del self.checkpoints[latest_checkpoint_step]
+                    latest_checkpoint_step = time_step
+                    self.checkpoints[time_step] = {
+                        "time_step": time_step,
+                        "time_steps": time_steps,
+                        "delta_t": delta_t,
+                        "hp_power_setpoint": copy.deepcopy(hp_power_setpoint),
+                        "room_temperature": copy.deepcopy(room_temperature),
+                        "ev_power": copy.deepcopy(ev_power),
+                        "status": inputs.status,
+                        "status_seed": inputs.status_seed,
+                        "models": {
+                            role: model.get_state() for role, model in self.model_roles().items()
+                            if model is not self.electric_grid
+                        },
+                        "recorder": recorder.get_state(),
+                        "rng_state": np.random.get_state(),
+                    }
+                    if self.checkpoint_folder_path is not None:
+                        os.makedirs(self.checkpoint_folder_path, exist_ok=True)
+                        save_checkpoint(
+                            self.checkpoints[time_step],
+                            os.path.join(self.checkpoint_folder_path, f"checkpoint_{time_step}.pkl"),
+                        )
+                time_clock = start_time + time_step * delta_t
+                current_status = window["status"][..., window_step]
+
+                # Map time step to the corresponding index in the power setpoint dataframe
+                corresponding_time_in_dataframe = window["dataset_times"][window_step]
+                event_log.context["time_step"] = time_step
+                log_step = event_log.enabled(DEBUG)
+                if log_step:
+                    event_log.log(
+                        DEBUG, "time_step", "Time step {time} | Simulation time clock: {time_clock:.2f}",
+                        time=corresponding_time_in_dataframe, time_clock=time_clock,
+                    )
+
+                # Compute new state based on the current power setpoint of the heat pump
+                grid_inputs = (
+                    time_step, passive_consumer_power_setpoints, hp_power_setpoint, grid_topology,
+                    corresponding_time_in_dataframe,
+                )
+                if grid_executor is not None:
+                    grid_future = grid_executor.submit(self.electric_grid.calculate_at, *grid_inputs)
+                else:
+                    all_consumer_voltages = self.electric_grid.calculate_at(*grid_inputs)
+
+                # Update EV power, ensuring it accumulates over time
+
+                heat_production_from_hp = self.heat_pump.calculate_at(time_step, hp_power_setpoint)
+                room_temperature = self.room.calculate_at(
+                    time_step, heat_production_from_hp, window["outside_temperature"][window_step],
+                )
+                if ev_power_trajectory is not None:
+                    ev_power = ev_power_trajectory[..., window_step]
+                else:
+                    ev_power = self.ev.calculate_at(time_step, ev_power, current_status)
+
+                if grid_executor is not None:
+                    all_consumer_voltages = grid_future.result()
+                if self.num_households is not None:
+                    smart_consumer_voltage = all_consumer_voltages["smart_consumers"]
+                else:
+                    smart_consumer_voltage = all_consumer_voltages["consumers"]["smart_consumer"]
+                if self.record_consumer_voltages and "consumer_voltages" not in recorder.signals:
+                    consumers = list(all_consumer_voltages["all_consumers"])
+                    recorder.register("consumer_voltages", (len(consumers),), labels=consumers)
+                # Adjust power setpoint using the controller
+                hp_power_setpoint = self.controller.calculate_at(
+                    time_step, hp_power_setpoint, current_status, ev_power, smart_consumer_voltage, room_temperature
+                )
+
+                if log_step:
+                    if self.num_households is not None:
+                        user_status = f"Users Away: {int(np.sum(current_status == 1))} of {self.num_households}"
+                    else:
+                        user_status = f"User Status: {'Away' if current_status == 1 else 'Home'}"
+                    event_log.log(
+                        DEBUG, "step_result",
+                        "-----------------------------------------------------------\n"
+                        "New power setpoint: {hp_power_setpoint}\nEV Power Production: {ev_power}\n{user_status}\n"
+                        "===========================================================",
+                        hp_power_setpoint=hp_power_setpoint, ev_power=ev_power, status=current_status,
+                        user_status=user_status,
+                    )
+
+                step_results = {
+                    "times": time_clock,
+                    "smart_consumer_voltage": smart_consumer_voltage,
+                    "temperature": room_temperature,
+                    "hp_power_setpoint": hp_power_setpoint,
+                    "heat_production": heat_production_from_hp,
+                    "ev_power": ev_power,
+                }
+                if self.record_status:
+                    step_results["status"] = current_status
+                if self.record_consumer_voltages:
+                    step_results["consumer_voltages"] = list(all_consumer_voltages["all_consumers"].values())
+                recorder.record(**step_results)
+                yield time_step
+        finally:
+            windows.close()
+            if grid_executor is not None:
+                grid_executor.shutdown()
+
+        run_time = perf_counter() - run_start_time
+        grid_statistics = {
+            name: value - grid_statistics_at_start.get(name, 0)
+            for name, value in (grid_model.statistics() if hasattr(grid_model, "statistics") else {}).items()
+        }
+        if self.profiler is not None:
+            self.profiler.add_run(time_steps - first_time_step, run_time)
+            self.profiler.add_counters(grid_statistics)
+        event_log.context.pop("time_step", None)
+        event_log.log(
+            INFO, "simulation_end", "Finished simulation of {time_steps} time steps in {run_time:.2f} s",
+            config_id=config_id, time_steps=time_steps - first_time_step, run_time=run_time,
+            model_updates={role: model.updates for role, model in self.model_roles().items()},
+        )
+        if grid_statistics:
+            event_log.log(
+                INFO, "grid_statistics", "Grid model: {summary}",
+                summary=", ".join(f"{name} {value}" for name, value in grid_statistics.items()), **grid_statistics,
             )
+        event_log.flush()
 
-            print("-----------------------------------------------------------")
-            print(f"New power setpoint: {hp_power_setpoint}")
-            print(f"EV Power Production: {ev_power}")  # Debugging print statement
-            print(f"User Status: {'Away' if current_status == 1 else 'Home'}")  # Debugging status
-            print("===========================================================")
-
-            results["times"].append(time_clock)
-            results["smart_consumer_voltage"].append(smart_consumer_voltage)
-            results["temperature"].append(room_temperature)
-            results["hp_power_setpoint"].append(hp_power_setpoint)
-            results["heat_production"].append(heat_production_from_hp)
-            results["ev_power"].append(ev_power)  # Store status
-
-        return results
+        self.result_signals = recorder.signals
+        return recorder.results()
 
 
 
@@ -162,40 +583,50 @@ class Manager:
             print("ERROR: No original results to compare!")
             return
 
-        print("Comparing original vs. forecasted simulation results:")
-        for key in self.results.keys():
-            if key != "times":  # Skip time values
-                original_avg = np.mean(self.results[key])
-                forecasted_avg = np.mean(forecasted_results[key])
-                print(f"{key}: Original Avg = {original_avg:.3f}, Forecasted Avg = {forecasted_avg:.3f}")
+        compare_results(self.results, forecasted_results)
 
             # ✅ Call the plot function
         self.plot_results(self.results, forecasted_results)
 
     def plot_results(self, original_results, forecasted_results):
         """✅ Updates plot_results to compare original and forecasted simulations."""
-
-        plt.style.use('ggplot')
-        _, axs = plt.subplots(3, 2, figsize=(12, 10))
-
-        metrics = [
-            ("smart_consumer_voltage", "Voltage [V]", 'blue'),
-            ("temperature", "Temperature [°C]", 'red'),
-            ("hp_power_setpoint", "Power Setpoint [kW]", 'green'),
-            ("heat_production", "Heat Production [kW]", 'orange'),
-            ("ev_power", "EV Power [kW]", 'purple'),
-        ]
-
-        for i, (metric, ylabel, color) in enumerate(metrics):
-            ax = axs[i // 2, i % 2]
-            ax.plot(original_results["times"], original_results[metric], color='black', linestyle='dashed',
-                    label="Original")
-            ax.plot(forecasted_results["times"], forecasted_results[metric], color=color, linestyle='solid',
-                    label="Forecasted")
-            ax.set_title(f"{metric.replace('_', ' ').title()} Over Time")
-            ax.set_ylabel(ylabel)
-            ax.legend()
-
-        plt.tight_layout()
-        plt.show()
-
+        plot_results(original_results, forecasted_results)
+
+
+def compare_results(original_results: dict, forecasted_results: dict, controller_configuration: dict = None):
+    """Print the comparison statistics of the original and forecasted simulation results (see `reporting`)."""
+    from reporting import comparison_statistics
+
+    print("Comparing original vs. forecasted simulation results:")
+    print(comparison_statistics(original_results, forecasted_results, controller_configuration).to_string(
+        float_format="{:.3f}".format,
+    ))
+
+
+def plot_results(original_results: dict, forecasted_results: dict):
+    """Plot the original and forecasted simulation results."""
+    import matplotlib.pyplot as plt  # Only imported when plotting
+
+    plt.style.use('ggplot')
+    _, axs = plt.subplots(3, 2, figsize=(12, 10))
+
+    metrics = [
+        ("smart_consumer_voltage", "Voltage [V]", 'blue'),
+        ("temperature", "Temperature [°C]", 'red'),
+        ("hp_power_setpoint", "Power Setpoint [kW]", 'green'),
+        ("heat_production", "Heat Production [kW]", 'orange'),
+        ("ev_power", "EV Power [kW]", 'purple'),
+    ]
+
+    for i, (metric, ylabel, color) in enumerate(metrics):
+        ax = axs[i // 2, i % 2]
+        ax.plot(original_results["times"], original_results[metric], color='black', linestyle='dashed',
+                label="Original")
+        ax.plot(forecasted_results["times"], forecasted_results[metric], color=color, linestyle='solid',
+                label="Forecasted")
+        ax.set_title(f"{metric.replace('_', ' ').title()} Over Time")
+        ax.set_ylabel(ylabel)
+        ax.legend()
+
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,158 @@
+"""Binary, memory-mapped cache for the CSV datasets.
+
+Each CSV file is parsed once and converted to NumPy `.npy` files (the values and the index) plus a small JSON file
+describing the columns. Later reads open the `.npy` files memory-mapped, so no CSV parsing is needed and worker
+processes reading the same dataset share the same pages of the page cache.
+
+A cache entry is keyed by the SHA-256 hash of the source file and the parse options. The modification time and size
+of the source file are remembered as well, so an unchanged file is not even re-hashed.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CACHE_FOLDER_NAME = ".cache"
+
+
+def read_csv_cached(
+    csv_path: str,
+    index_col=None,
+    parse_dates: bool = False,
+    dtype: str = "float64",
+    cache_folder_path: str = None,
+) -> pd.DataFrame:
+    """Read a CSV file through the binary cache, converting it on the first read.
+
+    Args:
+        csv_path (str): Path to the CSV file.
+        index_col: Column to use as the index (as in `pd.read_csv`).
+        parse_dates (bool): Parse the index as dates (as in `pd.read_csv`).
+        dtype (str): Data type of the values if all columns share one type, e.g. "float64" or "float32".
+        cache_folder_path (str): Folder for the cache entries (default: `.cache` next to the CSV file).
+
+    Returns:
+        pd.DataFrame: Data frame backed by read-only memory-mapped arrays.
+    """
+    if not os.path.isfile(csv_path):
+        raise FileNotFoundError(f"Dataset file {csv_path} not found.")
+    if cache_folder_path is None:
+        cache_folder_path = os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_FOLDER_NAME)
+
+    options = {"index_col": index_col, "parse_dates": parse_dates, "dtype": dtype}
+    entry_path = os.path.join(cache_folder_path, cache_entry_name(csv_path, options, cache_folder_path))
+    if not os.path.isdir(entry_path):
+        df = pd.read_csv(csv_path, index_col=index_col, parse_dates=parse_dates)
+        write_cache_entry(df, entry_path, dtype)
+
+    return read_cache_entry(entry_path)
+
+
+def cache_entry_name(csv_path: str, options: dict, cache_folder_path: str) -> str:
+    """Get the name of the cache entry of a CSV file, only hashing the file when its mtime or size changed."""
+    stat = os.stat(csv_path)
+    file_name = os.path.basename(csv_path)
+    lookup_path = os.path.join(cache_folder_path, f"{file_name}.json")
+
+    file_hash = None
+    if os.path.isfile(lookup_path):
+        with open(lookup_path, 'r') as file:
+            lookup = json.load(file)
+        if lookup["mtime_ns"] == stat.st_mtime_ns and lookup["size"] == stat.st_size:
+            file_hash = lookup["sha256"]
+
+    if file_hash is None:
+        file_hash = hash_file(csv_path)
+        os.makedirs(cache_folder_path, exist_ok=True)
+        write_json_atomically(
+            lookup_path, {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": file_hash},
+        )
+
+    options_hash = hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+    return f"{file_name}.{file_hash[:16]}.{options_hash[:8]}"
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 hash of a file."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def write_cache_entry(df: pd.DataFrame, entry_path: str, dtype: str):
+    """Write a data frame to a cache entry folder. The folder is written next to it and then renamed into place."""
+    cache_folder_path = os.path.dirname(entry_path)
+    os.makedirs(cache_folder_path, exist_ok=True)
+    temporary_path = tempfile.mkdtemp(dir=cache_folder_path, prefix=".tmp-")
+
+    try:
+        # Homogeneous data is stored as one 2D array, mixed data types as a structured array with one field per column.
+        if all(df.dtypes == df.dtypes.iloc[0]) and df.dtypes.iloc[0].kind == "f":
+            layout = "values"
+            values = df.to_numpy(dtype=dtype)
+        else:
+            layout = "records"
+            columns = {str(column): plain_array(df[column]) for column in df.columns}
+            values = np.empty(len(df), dtype=[(column, array.dtype) for column, array in columns.items()])
+            for column, array in columns.items():
+                values[column] = array
+        np.save(os.path.join(temporary_path, "values.npy"), values)
+
+        index = df.index
+        np.save(os.path.join(temporary_path, "index.npy"), plain_array(index))
+
+        metadata = {
+            "layout": layout,
+            "columns": [str(column) for column in df.columns],
+            "index_name": index.name,
+            "index_is_datetime": isinstance(index, pd.DatetimeIndex),
+        }
+        with open(os.path.join(temporary_path, "metadata.json"), 'w') as file:
+            json.dump(metadata, file)
+
+        os.rename(temporary_path, entry_path)
+    except OSError:
+        # Another process already wrote the same entry.
+        if not os.path.isdir(entry_path):
+            raise
+    finally:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+
+
+def plain_array(values: pd.Series) -> np.ndarray:
+    """Convert a column or index to a NumPy array that can be memory-mapped: text (and any other object values) is
+    stored as fixed-width unicode strings, with missing values as empty strings."""
+    array = values.to_numpy()
+    if array.dtype.kind == "O":
+        array = values.fillna("").astype(str).to_numpy(dtype=str)
+    return array
+
+
+def read_cache_entry(entry_path: str) -> pd.DataFrame:
+    """Open a cache entry as a data frame backed by memory-mapped arrays."""
+    with open(os.path.join(entry_path, "metadata.json"), 'r') as file:
+        metadata = json.load(file)
+
+    # Plain ndarray views on the memory map, so pandas treats them like any other array.
+    values = np.asarray(np.load(os.path.join(entry_path, "values.npy"), mmap_mode='r'))
+    index = pd.Index(np.load(os.path.join(entry_path, "index.npy")), name=metadata["index_name"])
+    if metadata["index_is_datetime"]:
+        index = pd.DatetimeIndex(index)
+
+    if metadata["layout"] == "values":
+        return pd.DataFrame(values, index=index, columns=metadata["columns"], copy=False)
+    return pd.DataFrame({column: values[column] for column in metadata["columns"]}, index=index, copy=False)
+
+
+def write_json_atomically(path: str, data: dict):
+    """Write a JSON file by writing a temporary file and renaming it into place."""
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(file_descriptor, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
@@ -0,0 +1,197 @@
+"""Partitioned co-simulation of a district of feeders on a pool of worker processes.
+
+Every feeder has its own settings configuration (its grid topology, passive consumer dataset and, optionally, its
+`smart_consumers`) and its own Manager. The feeders are partitioned over the worker processes, which advance their
+feeders one time step at a time (see `Manager.simulation_steps`). Only the substation boundary is synchronized: after
+every time step, each worker sends the total load of its feeders to the coordinator over a pipe, the coordinator
+computes the substation voltage from the load of the whole district (see `substation_voltage`) and sends it back, and
+every feeder uses it as its source voltage in the next time step, e.g.:
+    python district.py --feeders configurations/district --partitions 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from cosim_framework import Manager, generate_daily_status
+from dataset_cache import read_csv_cached
+from event_log import QUIET, EventLog, set_event_log
+from sweep import build_models, summarize_results
+
+
+def substation_voltage(total_power: float, no_load_voltage: float = 1.0, voltage_drop: float = 0.01) -> float:
+    """A simple model of the substation: its voltage [p.u.] drops linearly with the total load of the district.
+
+    Args:
+        total_power (float): Total active power of the loads of all feeders [W].
+        no_load_voltage (float): Voltage without load [p.u.].
+        voltage_drop (float): Voltage drop per MW of load [p.u./MW].
+    """
+    return no_load_voltage - voltage_drop * total_power / 1e6
+
+
+def load_feeder_configurations(feeders_folder_path: str) -> dict[str, dict]:
+    """Load the settings configuration of every feeder (one YAML file per feeder), keyed by the file name."""
+    feeder_configurations = {}
+    for config_file in sorted(os.listdir(feeders_folder_path)):
+        if config_file.endswith('.yaml'):
+            with open(os.path.join(feeders_folder_path, config_file), 'r') as file:
+                feeder_configurations[os.path.splitext(config_file)[0]] = yaml.safe_load(file)
+    if not feeder_configurations:
+        raise ValueError(f"No feeder configurations found in {feeders_folder_path}.")
+    return feeder_configurations
+
+
+def run_partition(
+    feeders: list[tuple[str, dict]],
+    controller_configuration: dict,
+    connection,
+    seed: int = 0,
+    results_folder_path: str = None,
+):
+    """Run the feeders of one partition in lockstep, exchanging their loads and the substation voltage every step.
+
+    Meant to be run in a worker process. Sends ("step", feeder loads) after every time step and expects the substation
+    voltage back, and finally sends ("done", summary per feeder), or ("error", message) if a feeder failed.
+    """
+    set_event_log(EventLog(QUIET))  # Workers only report their results
+    try:
+        runs = {}
+        for name, settings_configuration in feeders:
+            # Same occupancy pattern for every feeder, whatever the partitioning
+            time_settings = settings_configuration['InitializationSettings']['time']
+            num_days = -(-(time_settings['end_time'] - time_settings['start_time']) // 1440)
+            status = generate_daily_status(time_settings['delta_t'], np.random.default_rng(seed), num_days)
+            dataset = read_csv_cached(
+                settings_configuration['InitializationSettings']['passive_consumers_power_setpoints'],
+                index_col="snapshots", parse_dates=True,
+            )
+            models = build_models(settings_configuration, controller_configuration)
+            feeder_results_folder_path = None
+            if results_folder_path is not None:
+                feeder_results_folder_path = os.path.join(results_folder_path, name)
+            manager = Manager(models, settings_configuration, results_folder_path=feeder_results_folder_path)
+            grid_model = models[0].process_model
+            grid_engine = getattr(grid_model, "grid_engine", grid_model)  # The engine of a wrapped grid model
+            runs[name] = (manager.simulation_steps(dataset, status), grid_engine)
+
+        summaries = {}
+        while runs:
+            for name, (steps, _) in list(runs.items()):
+                try:
+                    next(steps)
+                except StopIteration as stop:
+                    summaries[name] = summarize_results(stop.value, controller_configuration)
+                    del runs[name]
+            if not runs:
+                break
+            connection.send(("step", [grid_engine.feeder_power for _, grid_engine in runs.values()]))
+            source_voltage = connection.recv()
+            for _, grid_engine in runs.values():
+                grid_engine.set_source_voltage(source_voltage)
+        connection.send(("done", summaries))
+    except Exception as e:
+        connection.send(("error", repr(e)))
+    finally:
+        connection.close()
+
+
+def run_district(
+    feeder_configurations: dict[str, dict],
+    controller_configuration: dict,
+    num_partitions: int = None,
+    seed: int = 0,
+    no_load_voltage: float = 1.0,
+    voltage_drop: float = 0.01,
+    results_folder_path: str = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Run all feeders of a district on `num_partitions` worker processes (default: one per CPU, at most one per
+    feeder), coupled by the substation voltage.
+
+    Returns:
+        tuple: Table with the total load of the district and the substation voltage per time step, and table with one
+            summary row per feeder (see `summarize_results`).
+    """
+    time_settings = [configuration['InitializationSettings']['time'] for configuration in feeder_configurations.values()]
+    if any(settings != time_settings[0] for settings in time_settings):
+        raise ValueError("All feeders of a district must have the same time settings.")
+    time_steps = int((time_settings[0]['end_time'] - time_settings[0]['start_time']) / time_settings[0]['delta_t'])
+
+    feeders = list(feeder_configurations.items())
+    num_partitions = min(num_partitions or os.cpu_count(), len(feeders))
+    connections, processes = [], []
+    for partition in range(num_partitions):
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=run_partition,
+            args=(feeders[partition::num_partitions], controller_configuration, worker_connection, seed,
+                  results_folder_path),
+        )
+        process.start()
+        worker_connection.close()  # Only the worker holds its end, so a dead worker shows up as EOFError
+        connections.append(connection)
+        processes.append(process)
+
+    total_power = np.zeros(time_steps)
+    source_voltages = np.zeros(time_steps)
+    summaries = {}
+    try:
+        for time_step in range(time_steps):
+            partition_powers = [receive(connection) for connection in connections]
+            total_power[time_step] = sum(sum(feeder_powers) for feeder_powers in partition_powers)
+            source_voltages[time_step] = substation_voltage(total_power[time_step], no_load_voltage, voltage_drop)
+            for connection in connections:
+                connection.send(source_voltages[time_step])
+        for connection in connections:
+            summaries.update(receive(connection, "done"))
+    finally:
+        for process in processes:
+            # Wait for the workers of a completed run, stop the workers of a failed one
+            process.join(timeout=None if summaries else 0)
+            if process.is_alive():
+                process.terminate()
+
+    substation = pd.DataFrame(
+        {"total_power": total_power, "substation_voltage": source_voltages},
+        index=pd.RangeIndex(time_steps, name="time_step"),
+    )
+    return substation, pd.DataFrame.from_dict(summaries, orient="index").rename_axis("feeder")
+
+
+def receive(connection, expected: str = "step"):
+    """Receive the next message of a partition, raising an error if the partition failed."""
+    try:
+        message, payload = connection.recv()
+    except EOFError as e:
+        raise RuntimeError("A district partition stopped without reporting its results.") from e
+    if message == "error":
+        raise RuntimeError(f"A district partition failed: {payload}")
+    if message != expected:
+        raise RuntimeError(f"Expected a {expected} message from a district partition, not {message}.")
+    return payload
+
+
+def main(args: argparse.Namespace):
+    """Run the district from the parsed command line arguments (see `python cli.py district --help`)."""
+    with open('./configurations/controller_config.yaml', 'r') as file:
+        controller_configuration = yaml.safe_load(file)
+    feeder_configurations = load_feeder_configurations(args.feeders)
+    print(f"Running {len(feeder_configurations)} feeders...")
+
+    substation, feeder_table = run_district(
+        feeder_configurations, controller_configuration, args.partitions, args.seed, args.no_load_voltage,
+        args.voltage_drop, args.results_folder,
+    )
+    substation.to_csv(args.output)
+    print(feeder_table)
+    print(f"Substation voltage: {substation['substation_voltage'].min():.4f} to "
+          f"{substation['substation_voltage'].max():.4f} p.u.")
+
+
+if __name__ == "__main__":
+    from cli import main as cli_main
+    cli_main(["district", *sys.argv[1:]])
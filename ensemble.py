@@ -0,0 +1,114 @@
+"""Monte Carlo ensemble of co-simulations over random occupancy schedules.
+
+All occupancy schedules are generated at once with a seeded random generator, the members are run in parallel on a
+process pool, and percentile bands and limit-violation statistics are reported, e.g.:
+    python ensemble.py --members 200 --seed 42 --max-workers 4
+"""
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from cosim_framework import Manager, generate_status_ensemble
+from event_log import QUIET, EventLog, set_event_log
+from load_configurations import load_configuration_files, load_dataset
+from sweep import build_models, summarize_results
+
+ENSEMBLE_SIGNALS = ["smart_consumer_voltage", "temperature", "ev_power"]
+
+
+def run_member(
+    status: np.ndarray,
+    settings_configuration: dict,
+    controller_configuration: dict,
+    use_forecasted: bool = False,
+    use_surrogate: bool = False,
+) -> dict:
+    """Run one ensemble member with the given occupancy schedule. Meant to be run in a worker process."""
+    set_event_log(EventLog(QUIET))  # Workers only report their results
+    dataset = load_dataset(use_forecasted)
+    models = build_models(settings_configuration, controller_configuration, use_surrogate)
+    manager = Manager(models, settings_configuration)
+    results = manager.run_simulation(dataset, status=status)
+    return {key: np.asarray(values) for key, values in results.items()}
+
+
+def run_ensemble(
+    settings_configuration: dict,
+    controller_configuration: dict,
+    num_members: int,
+    seed: int = None,
+    max_workers: int = None,
+    use_forecasted: bool = False,
+    use_surrogate: bool = False,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Run an ensemble of co-simulations, one per random occupancy schedule.
+
+    Returns:
+        tuple: The occupancy schedules (one row per member), and the results with one row per member per signal.
+    """
+    time_settings = settings_configuration['InitializationSettings']['time']
+    num_days = -(-(time_settings['end_time'] - time_settings['start_time']) // 1440)  # Whole days covering the horizon
+    statuses = generate_status_ensemble(
+        time_settings['delta_t'], num_members, np.random.default_rng(seed), num_days=num_days,
+    )
+
+    worker = partial(
+        run_member,
+        settings_configuration=settings_configuration,
+        controller_configuration=controller_configuration,
+        use_forecasted=use_forecasted,
+        use_surrogate=use_surrogate,
+    )
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        member_results = list(executor.map(worker, statuses, chunksize=max(1, num_members // 32)))
+
+    ensemble_results = {key: np.stack([results[key] for results in member_results]) for key in member_results[0]}
+    return statuses, ensemble_results
+
+
+def percentile_bands(
+    ensemble_results: dict[str, np.ndarray], percentiles: tuple = (5, 50, 95), signals: list[str] = ENSEMBLE_SIGNALS,
+) -> pd.DataFrame:
+    """Compute percentile bands over the members for every time step, e.g. column "temperature_p95"."""
+    bands = {}
+    for signal in signals:
+        signal_percentiles = np.percentile(ensemble_results[signal], percentiles, axis=0)
+        for percentile, values in zip(percentiles, signal_percentiles):
+            bands[f"{signal}_p{percentile:g}"] = values
+    return pd.DataFrame(bands, index=pd.Index(ensemble_results["times"][0], name="times"))
+
+
+def violation_statistics(ensemble_results: dict[str, np.ndarray], controller_configuration: dict) -> pd.DataFrame:
+    """Summarize every member (limit violations and means), one row per member."""
+    num_members = len(ensemble_results["times"])
+    rows = [
+        summarize_results({key: values[member] for key, values in ensemble_results.items()}, controller_configuration)
+        for member in range(num_members)
+    ]
+    return pd.DataFrame(rows, index=pd.RangeIndex(num_members, name="member"))
+
+
+def main(args: argparse.Namespace):
+    """Run the ensemble from the parsed command line arguments (see `python cli.py ensemble --help`)."""
+    controller_config, settings_configs = load_configuration_files('./configurations')
+    _, results = run_ensemble(
+        settings_configs[args.config], controller_config, args.members, args.seed, args.max_workers,
+        args.use_forecasted, args.use_surrogate,
+    )
+
+    band_percentiles = tuple(float(p) for p in args.percentiles.split(","))
+    percentile_bands(results, band_percentiles).to_csv(args.output)
+
+    statistics = violation_statistics(results, controller_config)
+    print(f"Members with a voltage violation: {(statistics['voltage_violation_share'] > 0).mean():.1%}")
+    print(f"Members with a temperature violation: {(statistics['temperature_violation_share'] > 0).mean():.1%}")
+    print(statistics.describe())
+
+
+if __name__ == "__main__":
+    from cli import main as cli_main
+    cli_main(["ensemble", *sys.argv[1:]])
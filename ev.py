@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def adjust_power(power: float, status: int) -> float:
     """
     Adjusts EV charging power based on user status.
@@ -19,3 +22,48 @@ def adjust_power(power: float, status: int) -> float:
         return min(power + 500, 25000)  # Charge while at home, but cap at 25000
     else:
         return power  # Maintain power at max if already full
+
+
+
+def adjust_power_array(power: np.ndarray, status: np.ndarray) -> np.ndarray:
+    """
+    Adjusts the EV charging power of many households at once, following the same rules as `adjust_power`.
+
+    Args:
+        power (np.ndarray): Current charging power per household.
+        status (np.ndarray): User status per household (0 = home, 1 = away).
+
+    Returns:
+        np.ndarray: Adjusted power values.
+    """
+    charged_power = np.where(power < 25000, np.minimum(power + 500, 25000), power)
+    return np.where(status == 1, 0, charged_power)
+
+
+def adjust_power_batch(initial_power, status: np.ndarray) -> np.ndarray:
+    """
+    Computes the EV charging power of every time step at once, as repeated calls of `adjust_power` would.
+
+    While the user is home, the power grows by 500 per step from its value at arrival (0 after being away, the initial
+    power before the first departure), capped at 25000; an initial power above the cap is kept until the first
+    departure. While the user is away, the power is 0.
+
+    Args:
+        initial_power: Charging power before the first time step (one value per household for many households).
+        status (np.ndarray): User status per time step (0 = home, 1 = away), with one row per household for many
+            households.
+
+    Returns:
+        np.ndarray: Charging power after every time step, in the shape of `status`.
+    """
+    steps = np.arange(status.shape[-1])
+    # Last time step the user was away (-1 before the first departure)
+    last_away_step = np.maximum.accumulate(np.where(status == 1, steps, -1), axis=-1)
+    steps_home = steps - last_away_step
+
+    initial_power = np.asarray(initial_power, dtype=float)[..., np.newaxis]
+    before_departure = last_away_step == -1
+    base_power = np.where(before_departure, initial_power, 0.0)
+    power = np.minimum(base_power + 500 * steps_home, 25000)
+    power = np.where(before_departure & (initial_power >= 25000), initial_power, power)
+    return np.where(status == 1, 0.0, power)
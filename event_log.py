@@ -0,0 +1,158 @@
+"""Buffered, leveled event log of the co-simulation.
+
+The framework, the grid and the controller log structured records instead of printing. A record has a level, an event
+name, the current context (e.g. the time step, set by the Manager) and event data. Verbosity levels:
+  - QUIET: nothing is logged;
+  - EVENTS: only controller interventions (voltage and temperature corrections);
+  - INFO: interventions plus the start and end of every run;
+  - DEBUG: everything, including the state of every time step.
+
+Records are buffered and written in batches, either as readable text (to the console by default) or as JSON lines (to
+a file). With `background=True` the batches are written by a background thread.
+"""
+import json
+import queue
+import sys
+import threading
+
+import numpy as np
+
+QUIET = 0
+EVENTS = 1
+INFO = 2
+DEBUG = 3
+LEVEL_NAMES = {EVENTS: "event", INFO: "info", DEBUG: "debug"}
+VERBOSITY_LEVELS = {"quiet": QUIET, "events": EVENTS, "info": INFO, "debug": DEBUG}
+
+
+class EventLog:
+    """A buffered log of structured records, written as text or JSON lines."""
+
+    def __init__(
+        self,
+        verbosity: int = INFO,
+        file_path: str = None,
+        buffer_size: int = 1024,
+        background: bool = False,
+        stream=None,
+    ):
+        """Initialize the event log.
+
+        Args:
+            verbosity (int): Most detailed level that is logged (QUIET, EVENTS, INFO or DEBUG).
+            file_path (str): File to write JSON lines to (default: write text to the stream).
+            buffer_size (int): Number of records buffered before they are written.
+            background (bool): Write the records with a background thread.
+            stream: Text stream for the text output (default: standard output).
+        """
+        self.verbosity = verbosity
+        self.buffer_size = buffer_size
+        self.context = {}  # Fields added to every record, e.g. the time step
+        self.buffer = []
+        # Guards the buffer and keeps batches in order when models on several threads log (reentrant: `log` flushes)
+        self.lock = threading.RLock()
+
+        if file_path is not None:
+            self.file = open(file_path, 'w')
+            self.format_record = format_json_record
+        else:
+            self.file = None
+            self.stream = stream
+            self.format_record = format_text_record
+
+        self.queue = None
+        self.writer_thread = None
+        if background:
+            self.queue = queue.SimpleQueue()
+            self.writer_thread = threading.Thread(target=self.write_queued_records, daemon=True)
+            self.writer_thread.start()
+
+    def enabled(self, level: int) -> bool:
+        """Whether records of the level are logged; check this before preparing expensive event data."""
+        return level <= self.verbosity
+
+    def log(self, level: int, event: str, message: str = None, **data):
+        """Log a record of the level, unless the verbosity is lower. Run-level (INFO) records are written directly.
+
+        The message is a template for the text output, formatted with the record fields when it is written, e.g.
+        "Voltage {voltage} too low".
+        """
+        if level > self.verbosity:
+            return
+        record = {"level": LEVEL_NAMES[level], "event": event, **self.context, **data}
+        if message is not None:
+            record["message"] = message
+        with self.lock:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.buffer_size or level == INFO:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered records."""
+        with self.lock:
+            if not self.buffer:
+                return
+            records, self.buffer = self.buffer, []
+            if self.queue is not None:
+                self.queue.put(records)
+            else:
+                self.write(records)
+
+    def write(self, records: list[dict]):
+        """Write records to the file or stream."""
+        output = self.file if self.file is not None else (self.stream or sys.stdout)
+        output.write("".join(self.format_record(record) + "\n" for record in records))
+        output.flush()
+
+    def write_queued_records(self):
+        """Write the batches of records put on the queue, until the log is closed. Runs in the background thread."""
+        while (records := self.queue.get()) is not None:
+            self.write(records)
+
+    def close(self):
+        """Write the remaining records, stop the background thread and close the file."""
+        self.flush()
+        if self.writer_thread is not None:
+            self.queue.put(None)
+            self.writer_thread.join()
+            self.writer_thread = None
+            self.queue = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def format_text_record(record: dict) -> str:
+    """Format a record as readable text: the message if it has one, the event and its data otherwise."""
+    if "message" in record:
+        return record["message"].format(**record)
+    data = " ".join(f"{key}={value}" for key, value in record.items() if key not in ("level", "event"))
+    return f"{record['event']} {data}"
+
+
+def format_json_record(record: dict) -> str:
+    """Format a record as one compact JSON line."""
+    return json.dumps({key: value for key, value in record.items() if key != "message"}, default=to_builtin_type,
+                      separators=(",", ":"))
+
+
+def to_builtin_type(value):
+    """Convert NumPy (and other) values that JSON cannot serialize."""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return str(value)
+
+
+_event_log = EventLog()
+
+
+def get_event_log() -> EventLog:
+    """Get the event log used by the co-simulation modules."""
+    return _event_log
+
+
+def set_event_log(event_log: EventLog) -> EventLog:
+    """Set the event log used by the co-simulation modules. Returns the previous one, which is not closed."""
+    global _event_log
+    previous_event_log, _event_log = _event_log, event_log
+    return previous_event_log
@@ -1,7 +1,15 @@
 """Electricity grid model."""
+import hashlib
+import os
+import re
+from array import array
+from collections import OrderedDict
+from functools import partial
+
 import numpy as np
 import pandas as pd
 from power_grid_model import (
+    CalculationMethod,
     LoadGenType,
     PowerGridModel,
     ComponentType,
@@ -9,14 +17,21 @@ from power_grid_model import (
     DatasetType,
 )
 
+from dataset_cache import CACHE_FOLDER_NAME, cache_entry_name, read_csv_cached
+from event_log import DEBUG, get_event_log
+from profiling import call_timed
+
 #df = pd.read_csv("data/combined_active_power.csv");
 
+# Smart consumers in the active power data frame (the last one sets the reported "smart_consumer" voltage).
+SMART_CONSUMER_NAMES = [f"Customer_{i}" for i in range(95, 67, -1)]
+
 def electric_grid_function(
     active_power_df: pd.DataFrame,
     smart_consumer_power_setpoint: float,
     grid_topology: pd.DataFrame,
     time_step: pd.DatetimeIndex,
-    smart_consumer_names_in_active_power_df: list[str] = ["Customer_95", "Customer_94", "Customer_93", "Customer_92", "Customer_91", "Customer_90", "Customer_89", "Customer_88", "Customer_87", "Customer_86", "Customer_85", "Customer_84", "Customer_83", "Customer_82", "Customer_81", "Customer_80", "Customer_79",  "Customer_78", "Customer_77", "Customer_76", "Customer_75", "Customer_74", "Customer_73", "Customer_72", "Customer_71", "Customer_70",  "Customer_69" ,"Customer_68"],
+    smart_consumer_names_in_active_power_df: list[str] = SMART_CONSUMER_NAMES,
 ) -> dict[str, float]:
     """Function to simulate power flow in an electricity grid with multiple smart consumers."""
     # 1. Initialize voltages dictionary to store consumer voltages.
@@ -34,8 +49,9 @@ def electric_grid_function(
     # 4. Run power flow for the given time step.
     consumer_voltage_dict = run_power_flow(grid_topology, active_power_df, time_step)
 
-    # 5. Update voltages dictionary with consumer voltages.
+    # 5. Update voltages dictionary with consumer voltages (and keep the voltages of all consumers by name).
     voltages["consumers"].update(consumer_voltage_dict)
+    voltages["all_consumers"] = dict(consumer_voltage_dict)
 
     # 6. Collect smart consumer voltages into a separate sub-dictionary under the key "smart_consumers".
     smart_consumers_voltages = {}
@@ -64,7 +80,9 @@ def run_power_flow(
 ) -> dict[str, float]:
     """Run the power flow for a given time step."""
     # 1. Prepare power flow data
-    input_data = prepare_power_flow_data(grid_topology_df, active_power_df, time_step)
+    topology = GridTopology.from_data_frame(grid_topology_df)
+    consumers = active_power_df.columns
+    input_data = topology.input_data(consumers, active_power_df.loc[time_step, :].values)
     
     # 2. Initialize power flow model with input data
     model = PowerGridModel(input_data)
@@ -72,9 +90,9 @@ def run_power_flow(
     # 3. Run power flow model
     output_data = model.calculate_power_flow()
     
-    # 4. Get node voltages
-    voltages = output_data[ComponentType.node]["u_pu"].flatten().tolist()
-    consumers = active_power_df.columns
+    # 4. Get the voltages of the nodes the consumers are connected to
+    node_voltages = output_data[ComponentType.node]["u_pu"]
+    voltages = node_voltages[topology.node_positions(topology.consumer_nodes(consumers))].tolist()
     consumer_voltage_dict = dict(zip(consumers, voltages))
 
     return consumer_voltage_dict
@@ -84,47 +102,160 @@ def prepare_power_flow_data(
     grid_topology_df: pd.DataFrame, active_power_df: pd.DataFrame, time_step: pd.DatetimeIndex,
 ) -> dict:
     """Prepare the data for the power flow calculation."""
-    # Initialize line data
-    num_lines = len(grid_topology_df)
-    line = initialize_array(DatasetType.input, ComponentType.line, num_lines)
-    line["id"] = np.arange(96, 96 + num_lines)
-    line["from_node"] = grid_topology_df["FROM"].values
-    line["to_node"] = grid_topology_df["TO"].values
-    line["from_status"] = np.ones(num_lines)
-    line["to_status"] = np.ones(num_lines)
-    line["r1"] = grid_topology_df["Raa"].values
-    line["x1"] = grid_topology_df["Xaa"].values
-    line["c1"] = np.full(num_lines, 10e-6)
-    line["tan1"] = np.zeros(num_lines)
-    line["i_n"] = grid_topology_df["Imax"].values
-
-    # Initialize node data
-    node = initialize_array(DatasetType.input, ComponentType.node, 95)
-    node["id"] = np.arange(1, 96)
-    node["u_rated"] = [0.4e3] * 95  # Rated voltage (230V)
-
-    # Initialize source (slack Node)
-    source = initialize_array(DatasetType.input, ComponentType.source, 1)
-    source["id"] = [96 + num_lines + 95]
-    source["node"] = [1]  # Slack node
-    source["status"] = [1]
-    source["u_ref"] = [1.0]  # Reference voltage (p.u.)
-
-    # Initialize load data
-    sym_load = initialize_array(DatasetType.input, ComponentType.sym_load, 95)
-    sym_load["id"] = np.arange(96 + num_lines, 96 + num_lines + 95)
-    sym_load["node"] = np.arange(1, 96)
-    sym_load["status"] = np.ones(95)
-    sym_load["type"] = np.full(95, LoadGenType.const_power)
-    sym_load["p_specified"] = active_power_df.loc[time_step, :].values
-    sym_load["q_specified"] = calculate_reactive_power_from_active_power(sym_load["p_specified"])
-
-    return {
-        ComponentType.node: node,
-        ComponentType.line: line,
-        ComponentType.sym_load: sym_load,
-        ComponentType.source: source,
-    }
+    topology = GridTopology.from_data_frame(grid_topology_df)
+    return topology.input_data(active_power_df.columns, active_power_df.loc[time_step, :].values)
+
+
+class GridTopology:
+    """The power grid model input arrays of a feeder (nodes, lines and the source), compiled from its topology.
+
+    The nodes are the ones in the FROM and TO columns of the grid topology, and the slack node is the root of the
+    radial feeder (the only node that is never a TO node) unless given. The IDs of the lines, loads and the source
+    follow the highest node ID. Loads are added per consumer by `input_data`: a consumer named like "Customer_12" is
+    connected to node 12, otherwise the consumers are connected to the nodes in order.
+
+    A compiled topology can be saved and loaded again (see `compile_grid_topology`), so large feeders are only
+    compiled once.
+    """
+
+    def __init__(self, node: np.ndarray, line: np.ndarray, source: np.ndarray):
+        """Initialize the topology from power grid model input arrays."""
+        self.node = node
+        self.line = line
+        self.source = source
+
+    @classmethod
+    def from_data_frame(
+        cls, grid_topology_df: pd.DataFrame, u_rated: float = 0.4e3, slack_node: int = None,
+    ) -> "GridTopology":
+        """Compile the topology from a grid topology data frame (columns FROM, TO, Raa, Xaa and Imax).
+
+        Args:
+            grid_topology_df (pd.DataFrame): One row per line.
+            u_rated (float): Rated voltage of all nodes [V].
+            slack_node (int): Node the source is connected to (default: the root of the radial feeder).
+        """
+        from_nodes = grid_topology_df["FROM"].to_numpy(dtype=np.int64)
+        to_nodes = grid_topology_df["TO"].to_numpy(dtype=np.int64)
+        node_ids = np.union1d(from_nodes, to_nodes)
+
+        if slack_node is None:
+            root_nodes = np.setdiff1d(from_nodes, to_nodes)
+            if len(root_nodes) != 1:
+                raise ValueError(
+                    f"Cannot derive the slack node from the grid topology (root nodes: {root_nodes.tolist()})."
+                )
+            slack_node = root_nodes[0]
+        elif slack_node not in node_ids:
+            raise ValueError(f"Slack node {slack_node} is not in the grid topology.")
+
+        # Initialize node data
+        node = initialize_array(DatasetType.input, ComponentType.node, len(node_ids))
+        node["id"] = node_ids
+        node["u_rated"] = u_rated
+
+        # Initialize line data, with IDs following the node IDs
+        num_lines = len(grid_topology_df)
+        first_line_id = node_ids[-1] + 1
+        line = initialize_array(DatasetType.input, ComponentType.line, num_lines)
+        line["id"] = np.arange(first_line_id, first_line_id + num_lines)
+        line["from_node"] = from_nodes
+        line["to_node"] = to_nodes
+        line["from_status"] = 1
+        line["to_status"] = 1
+        line["r1"] = grid_topology_df["Raa"].to_numpy()
+        line["x1"] = grid_topology_df["Xaa"].to_numpy()
+        line["c1"] = 10e-6
+        line["tan1"] = 0.0
+        line["i_n"] = grid_topology_df["Imax"].to_numpy()
+
+        # Initialize source (slack node); its ID is set after the load IDs in `input_data`
+        source = initialize_array(DatasetType.input, ComponentType.source, 1)
+        source["node"] = slack_node
+        source["status"] = 1
+        source["u_ref"] = 1.0  # Reference voltage (p.u.)
+
+        return cls(node, line, source)
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        """IDs of the nodes, sorted."""
+        return self.node["id"]
+
+    def consumer_nodes(self, consumers: list[str]) -> np.ndarray:
+        """Get the node ID every consumer is connected to."""
+        numbers = [re.search(r"(\d+)$", str(consumer)) for consumer in consumers]
+        if all(numbers):
+            consumer_nodes = np.array([int(number.group(1)) for number in numbers], dtype=np.int64)
+            if np.isin(consumer_nodes, self.node_ids).all():
+                return consumer_nodes
+
+        if len(consumers) > len(self.node_ids):
+            raise ValueError(f"Cannot connect {len(consumers)} consumers to a grid of {len(self.node_ids)} nodes.")
+        return self.node_ids[:len(consumers)].copy()
+
+    def node_positions(self, node_ids: np.ndarray) -> np.ndarray:
+        """Get the positions of nodes in the node arrays (and node results) of the power grid model."""
+        return np.searchsorted(self.node_ids, node_ids)
+
+    def input_data(self, consumers: list[str], active_power: np.ndarray) -> dict:
+        """Get the power grid model input data with one load per consumer, with the given active power [W]."""
+        num_loads = len(consumers)
+        first_load_id = self.line["id"][-1] + 1 if len(self.line) else self.node_ids[-1] + 1
+
+        # Initialize load data
+        sym_load = initialize_array(DatasetType.input, ComponentType.sym_load, num_loads)
+        sym_load["id"] = np.arange(first_load_id, first_load_id + num_loads)
+        sym_load["node"] = self.consumer_nodes(consumers)
+        sym_load["status"] = 1
+        sym_load["type"] = LoadGenType.const_power
+        sym_load["p_specified"] = active_power
+        sym_load["q_specified"] = calculate_reactive_power_from_active_power(sym_load["p_specified"])
+
+        source = self.source.copy()
+        source["id"] = first_load_id + num_loads
+
+        return {
+            ComponentType.node: self.node,
+            ComponentType.line: self.line,
+            ComponentType.sym_load: sym_load,
+            ComponentType.source: source,
+        }
+
+    def save(self, path: str):
+        """Save the compiled topology as a NumPy `.npz` file."""
+        np.savez(path, node=self.node, line=self.line, source=self.source)
+
+    @classmethod
+    def load(cls, path: str) -> "GridTopology":
+        """Load a compiled topology saved with `save`."""
+        with np.load(path) as arrays:
+            return cls(arrays["node"], arrays["line"], arrays["source"])
+
+
+def compile_grid_topology(
+    grid_topology_path: str, u_rated: float = 0.4e3, slack_node: int = None, cache_folder_path: str = None,
+) -> GridTopology:
+    """Compile the topology of a grid topology CSV file, through a cache next to the dataset cache entries.
+
+    The compiled topology is keyed by the hash of the CSV file and the options, like the dataset cache entries.
+    """
+    if cache_folder_path is None:
+        cache_folder_path = os.path.join(os.path.dirname(os.path.abspath(grid_topology_path)), CACHE_FOLDER_NAME)
+
+    options = {"topology": "compiled", "u_rated": u_rated, "slack_node": slack_node}
+    entry_path = os.path.join(
+        cache_folder_path, cache_entry_name(grid_topology_path, options, cache_folder_path) + ".npz",
+    )
+    if os.path.isfile(entry_path):
+        return GridTopology.load(entry_path)
+
+    topology = GridTopology.from_data_frame(read_csv_cached(grid_topology_path), u_rated, slack_node)
+    # Save next to the entry and rename it into place, so other processes never read a partial file.
+    temporary_path = f"{entry_path}.{os.getpid()}.tmp.npz"
+    topology.save(temporary_path)
+    os.replace(temporary_path, entry_path)
+    return topology
 
 
 def calculate_reactive_power_from_active_power(active_power, power_factor: float =0.95) -> float:
@@ -139,16 +270,423 @@ def process_active_power_data_frame(active_power_df: pd.DataFrame) -> pd.DataFra
     return active_power_df
 
 
-# Run script as standalone with no interaction between the models ...
-active_power_df = pd.read_csv("data/combined_active_power.csv", index_col=0, parse_dates=True)
-grid_topology_df = pd.read_csv("data/grid_topology.csv")
-final_time_step = pd.DatetimeIndex(["2025-01-31 23:45:00"])
+class PowerFlowCache:
+    """A bounded cache of power flow results (node voltages), evicting the least recently used entries.
+
+    Entries are keyed by the grid (see `ElectricGridEngine.grid_key`), the source voltage, the solver settings (see
+    `SolverPolicy.key`) and the active power of all loads, rounded to `resolution` [W], so states that repeat (up to
+    the resolution) cost a lookup instead of a power flow.
+    """
+
+    def __init__(self, size: int = 4096, resolution: float = 1.0):
+        """Initialize an empty cache of at most `size` entries."""
+        if size < 1:
+            raise ValueError(f"Power flow cache size must be positive, not {size}.")
+        self.size = size
+        self.resolution = resolution
+        self.entries = OrderedDict()  # Least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, grid_key: bytes, active_power: np.ndarray) -> bytes:
+        """Get the key of a load vector [W] on a grid."""
+        return grid_key + np.round(active_power / self.resolution).astype(np.int64).tobytes()
+
+    def get(self, key: bytes) -> np.ndarray:
+        """Get the cached node voltages of a key (None if not cached), counting the hit or miss."""
+        node_voltages = self.entries.get(key)
+        if node_voltages is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return node_voltages
+
+    def put(self, key: bytes, node_voltages: np.ndarray):
+        """Cache the node voltages of a key, evicting the least recently used entry if the cache is full."""
+        self.entries[key] = node_voltages
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else float("nan")
+
+
+class SolverPolicy:
+    """Chooses the power flow method of every step, with the tolerance and iteration limit of the solver.
+
+    With the method "adaptive", the cheap `cheap_method` (e.g. "linear" or "linear_current", which need no iterations)
+    is used while the node voltages of the last power flow are more than `boundary_margin` within the
+    `minimum_voltage`/`maximum_voltage` bounds. Newton-Raphson is used for the first power flow, near the bounds, when
+    the total load changed more than `load_change_threshold` [W] since the last power flow, and to redo a cheap power
+    flow whose voltages turn out to be near the bounds. Any other method is used for every step.
+
+    The method of every power flow is recorded (`methods`), as well as the cheap power flows that were redone.
+    """
+
+    def __init__(
+        self,
+        voltage_min: float,
+        voltage_max: float,
+        method: str = "newton_raphson",
+        cheap_method: str = "linear_current",
+        boundary_margin: float = 0.02,
+        load_change_threshold: float = None,
+        error_tolerance: float = 1e-8,
+        max_iterations: int = 20,
+    ):
+        """Initialize the policy for the given voltage bounds [p.u.]."""
+        self.voltage_min = voltage_min
+        self.voltage_max = voltage_max
+        self.adaptive = method == "adaptive"
+        self.method = CalculationMethod.newton_raphson if self.adaptive else CalculationMethod[method]
+        self.cheap_method = CalculationMethod[cheap_method]
+        self.boundary_margin = boundary_margin
+        self.load_change_threshold = load_change_threshold
+        self.error_tolerance = error_tolerance
+        self.max_iterations = max_iterations
+
+        self.last_active_power = None  # Active power of the last power flow [W]
+        self.last_node_voltages = None
+        self.methods = array('b')  # Method of every power flow (`CalculationMethod` values)
+        self.redone = 0  # Cheap power flows redone with Newton-Raphson
+
+    def select(self, active_power: np.ndarray) -> CalculationMethod:
+        """Choose the method of the power flow of a load vector [W]."""
+        if not self.adaptive or self.last_node_voltages is None:
+            return self.method
+        if self.load_change_threshold is not None and (
+            np.abs(active_power - self.last_active_power).sum() > self.load_change_threshold
+        ):
+            return self.method
+        return self.method if self.near_bounds(self.last_node_voltages) else self.cheap_method
+
+    def near_bounds(self, node_voltages: np.ndarray) -> bool:
+        """Check whether a node voltage is within the boundary margin of the voltage bounds."""
+        return bool(
+            node_voltages.min() < self.voltage_min + self.boundary_margin
+            or node_voltages.max() > self.voltage_max - self.boundary_margin
+        )
+
+    @property
+    def key(self) -> bytes:
+        """Hash of the settings of the policy, e.g. to key cached power flow results."""
+        settings = (
+            self.voltage_min, self.voltage_max, self.adaptive, self.method.name, self.cheap_method.name,
+            self.boundary_margin, self.load_change_threshold, self.error_tolerance, self.max_iterations,
+        )
+        return hashlib.sha256(repr(settings).encode()).digest()
+
+    def options(self, method: CalculationMethod = None) -> dict:
+        """Get the arguments of `PowerGridModel.calculate_power_flow` for a method (default: the exact method)."""
+        return {
+            "calculation_method": self.method if method is None else method,
+            "error_tolerance": self.error_tolerance,
+            "max_iterations": self.max_iterations,
+        }
+
+    def record(self, method: CalculationMethod, active_power: np.ndarray, node_voltages: np.ndarray):
+        """Record the method and the result of a power flow (without a method: a result looked up in a cache)."""
+        if method is not None:
+            self.methods.append(method.value)
+        self.last_active_power = active_power
+        self.last_node_voltages = node_voltages
+
+    def summary(self) -> dict[str, int]:
+        """Count the power flows per method."""
+        methods, counts = np.unique(np.frombuffer(self.methods, dtype=np.int8), return_counts=True)
+        return {CalculationMethod(method).name: int(count) for method, count in zip(methods, counts)}
+
+
+class ElectricGridEngine:
+    """A stateful electricity grid model that builds the power grid model once and only updates loads each step.
+
+    The engine is a drop-in replacement for `electric_grid_function`: it is called with the same arguments and
+    returns the same voltages dictionary. The topology and the active power data frame are preprocessed into NumPy
+    arrays on the first call (and again only when a different data frame or topology is passed in). A different data
+    frame with the same consumers, such as the next window of a streamed dataset, keeps the power grid model.
+
+    The grid size and the consumer-to-node mapping follow from the topology and the consumer columns (see
+    `GridTopology`). A topology compiled beforehand (e.g. with `compile_grid_topology`) can be passed in, in which case
+    it is used instead of compiling the grid topology data frame passed to the calls.
+
+    With a `recompute_threshold`, the engine is event-driven: the power flow is only recomputed when the active power
+    of a load changed more than the threshold [W] since the last power flow, and the last voltages are held otherwise.
+
+    With a `power_flow_cache`, the node voltages of repeated load vectors are looked up instead of recomputed (see
+    `PowerFlowCache`). The cache may be shared by engines, e.g. by the scenarios run in one worker process.
+
+    With a `solver_policy`, the power flow method, tolerance and iteration limit are chosen per step (see
+    `SolverPolicy`) instead of the library defaults.
+
+    The voltage of the source can be set between steps (see `set_source_voltage`), e.g. by the substation model of a
+    district of feeders, which in turn uses the total active power of the loads of the last step (`feeder_power`).
+    """
+
+    def __init__(
+        self,
+        smart_consumer_names_in_active_power_df: list[str] = SMART_CONSUMER_NAMES,
+        topology: GridTopology = None,
+        recompute_threshold: float = None,
+        power_flow_cache: "PowerFlowCache" = None,
+        solver_policy: SolverPolicy = None,
+    ):
+        """Initialize the engine for the given smart consumers (and optionally a compiled topology)."""
+        self.smart_consumer_names = list(smart_consumer_names_in_active_power_df)
+        self.topology = topology
+        self.recompute_threshold = recompute_threshold
+        self.held_steps = 0  # Steps that held the voltages of the last power flow
+        self.power_flow_cache = power_flow_cache
+        self.solver_policy = solver_policy
+
+        # Preprocessed state, filled in by `prepare`
+        self.active_power_df = None
+        self.active_power_columns = None
+        self.grid_topology_df = None
+        self.consumers = []
+        self.active_power = None  # Active power of all consumers for all time steps [W]
+        self.time_index = None
+        self.smart_consumer_columns = None
+        self.consumer_node_positions = None  # Position of the node of every consumer in the node voltages
+        self.smart_consumer_node_positions = None
+        self.model = None
+        self.sym_load_update = None
+        self.last_active_power = None  # Active power of the last power flow [W]
+        self.last_node_voltages = None
+        self.grid_key = None  # Hash of the grid and the load connections, the first part of the cache keys
+        self.source_voltage = None  # Voltage of the source [p.u.] (None: the reference voltage of the topology)
+        self.source_key = b""  # Source voltage part of the cache keys
+        self.source_update = None
+        self.feeder_power = 0.0  # Total active power of the loads of the last step [W]
+        self.profiler = None  # Set by the Manager to time the parts of a step
+
+    def __call__(
+        self,
+        active_power_df: pd.DataFrame,
+        smart_consumer_power_setpoint: float,
+        grid_topology: pd.DataFrame,
+        time_step: pd.DatetimeIndex,
+    ) -> dict[str, float]:
+        """Run the power flow for one time step, only updating the loads of the power grid model."""
+        # 1. Take the active power of the time step and apply the smart consumer power setpoint.
+        active_power = call_timed(
+            self.profiler, "electric_grid.data_prep", self.consumer_active_power,
+            active_power_df, smart_consumer_power_setpoint, grid_topology, time_step,
+        )
+
+        # 2. Run the power flow with the updated loads (unless the loads barely changed) and map the node voltages to
+        # the consumers.
+        if self.recompute_threshold is not None and self.last_active_power is not None and np.all(
+            np.abs(active_power - self.last_active_power) <= self.recompute_threshold
+        ):
+            self.held_steps += 1
+            node_voltages = self.last_node_voltages
+        else:
+            node_voltages = self.update_power_flow(active_power)
+            self.last_active_power, self.last_node_voltages = active_power, node_voltages
+        return call_timed(self.profiler, "electric_grid.results", self.voltages_dictionary, time_step, node_voltages)
+
+    def consumer_active_power(
+        self,
+        active_power_df: pd.DataFrame,
+        smart_consumer_power_setpoint: float,
+        grid_topology: pd.DataFrame,
+        time_step: pd.DatetimeIndex,
+    ) -> np.ndarray:
+        """Get the active power of all consumers [W] for a time step, with the smart consumer power setpoint applied.
+
+        The setpoint is either one value for all smart consumers, or an array with one value per smart consumer.
+        """
+        if active_power_df is not self.active_power_df or grid_topology is not self.grid_topology_df:
+            if grid_topology is self.grid_topology_df and list(active_power_df.columns) == self.active_power_columns:
+                self.load_active_power(active_power_df)
+            else:
+                self.prepare(active_power_df, grid_topology)
+
+        active_power = self.active_power[self.time_step_position(time_step)].copy()
+        active_power[self.smart_consumer_columns] = smart_consumer_power_setpoint
+        self.feeder_power = active_power.sum()
+        return active_power
+
+    def voltages_dictionary(self, time_step: pd.DatetimeIndex, node_voltages: np.ndarray) -> dict:
+        """Map node voltages to the consumers, in the same format as `electric_grid_function`.
+
+        The voltages of all smart consumers are also returned as an array under "smart_consumers", in the order of
+        the smart consumer names, and the voltages of all consumers by name under "all_consumers".
+        """
+        all_consumers = dict(zip(self.consumers, node_voltages[self.consumer_node_positions].tolist()))
+        voltages = {
+            "time step": time_step,
+            "consumers": dict(all_consumers),
+            "all_consumers": all_consumers,
+            "smart_consumers": node_voltages[self.smart_consumer_node_positions],
+        }
+
+        # 3. Update voltages dictionary with smart consumer voltage and rename the key to "smart_consumer".
+        for smart_consumer_name in self.smart_consumer_names:
+            voltages["consumers"]["smart_consumer"] = voltages["consumers"].pop(smart_consumer_name)
+
+        return voltages
+
+    def prepare(self, active_power_df: pd.DataFrame, grid_topology: pd.DataFrame):
+        """Preprocess the active power data and the topology, and build the power grid model once."""
+        self.load_active_power(active_power_df)
+        self.smart_consumer_columns = np.array(
+            [self.consumers.index(name) for name in self.smart_consumer_names], dtype=np.int64
+        )
+
+        topology = self.topology if self.topology is not None else GridTopology.from_data_frame(grid_topology)
+        self.consumer_node_positions = topology.node_positions(topology.consumer_nodes(self.consumers))
+        self.smart_consumer_node_positions = self.consumer_node_positions[self.smart_consumer_columns]
+
+        input_data = topology.input_data(self.consumers, self.active_power[0])
+        self.model = PowerGridModel(input_data)
+
+        # Preallocate the update dataset; only the active and reactive power of the loads change per step.
+        sym_load = input_data[ComponentType.sym_load]
+        self.sym_load_update = initialize_array(DatasetType.update, ComponentType.sym_load, len(sym_load))
+        self.sym_load_update["id"] = sym_load["id"]
+        # Hash field by field: the padding bytes of the structured arrays are not initialized
+        grid_arrays = [input_data[ComponentType.node], input_data[ComponentType.line], input_data[ComponentType.source]]
+        grid_fields = [array[field] for array in grid_arrays for field in array.dtype.names] + [sym_load["node"]]
+        self.grid_key = hashlib.sha256(b"".join(np.ascontiguousarray(field).tobytes() for field in grid_fields)).digest()
+
+        self.source_update = initialize_array(DatasetType.update, ComponentType.source, 1)
+        self.source_update["id"] = input_data[ComponentType.source]["id"]
+        if self.source_voltage is not None:
+            self.update_source()
+
+        self.grid_topology_df = grid_topology
+        self.last_active_power = None
+        self.last_node_voltages = None
+
+        get_event_log().log(
+            DEBUG, "grid_prepared", "Prepared power grid model with {nodes} nodes and {loads} loads",
+            nodes=len(input_data[ComponentType.node]), loads=len(sym_load),
+        )
+
+    def load_active_power(self, active_power_df: pd.DataFrame):
+        """Preprocess the active power data of the consumers [W], without touching the power grid model."""
+        processed_df = process_active_power_data_frame(active_power_df)
+        self.consumers = list(processed_df.columns)
+        self.active_power = processed_df.to_numpy(dtype=np.float64)
+        self.time_index = processed_df.index
+        self.active_power_df = active_power_df
+        self.active_power_columns = list(active_power_df.columns)
+
+    def set_source_voltage(self, source_voltage: float):
+        """Set the voltage of the source [p.u.] for the next power flows."""
+        if source_voltage == self.source_voltage:
+            return
+        self.source_voltage = source_voltage
+        self.last_active_power = None  # The held voltages belong to the previous source voltage
+        if self.model is not None:
+            self.update_source()
+
+    def update_source(self):
+        """Update the voltage of the source of the power grid model."""
+        self.source_update["u_ref"] = self.source_voltage
+        self.model.update(update_data={ComponentType.source: self.source_update})
+        self.source_key = np.float64(self.source_voltage).tobytes()
+
+    def time_step_position(self, time_step: pd.DatetimeIndex) -> int:
+        """Get the row of the active power data belonging to a time stamp (or single-entry datetime index)."""
+        if isinstance(time_step, pd.DatetimeIndex):
+            time_step = time_step[0]
+        return self.time_index.get_loc(time_step)
+
+    def update_power_flow(self, active_power: np.ndarray) -> np.ndarray:
+        """Update the loads of the power grid model and run the power flow. Returns the node voltages [p.u.].
+
+        With a power flow cache, the voltages of a cached load vector are returned without running the power flow.
+        """
+        if self.power_flow_cache is None:
+            return self.calculate_power_flow(active_power)
+
+        solver_key = self.solver_policy.key if self.solver_policy is not None else b""
+        key = self.power_flow_cache.key(self.grid_key + self.source_key + solver_key, active_power)
+        node_voltages = self.power_flow_cache.get(key)
+        if node_voltages is None:
+            node_voltages = self.calculate_power_flow(active_power)
+            self.power_flow_cache.put(key, node_voltages)
+        elif self.solver_policy is not None:
+            self.solver_policy.record(None, active_power, node_voltages)  # The policy continues from the cached result
+        return node_voltages
+
+    def calculate_power_flow(self, active_power: np.ndarray) -> np.ndarray:
+        """Update the loads of the power grid model and run the power flow, without the cache."""
+        call_timed(self.profiler, "electric_grid.data_prep", self.update_loads, active_power)
+        if self.solver_policy is None:
+            output_data = call_timed(
+                self.profiler, "electric_grid.calculate_power_flow", self.model.calculate_power_flow,
+            )
+            return output_data[ComponentType.node]["u_pu"]
+
+        # Run the power flow with the method of the policy, and redo a cheap one that ends up near the bounds.
+        policy = self.solver_policy
+        method = policy.select(active_power)
+        node_voltages = self.run_power_flow_method(policy.options(method))
+        redone = method != policy.method and policy.near_bounds(node_voltages)
+        if redone:
+            policy.redone += 1
+            method = policy.method
+            node_voltages = self.run_power_flow_method(policy.options(method))
+        policy.record(method, active_power, node_voltages)
+
+        event_log = get_event_log()
+        if event_log.enabled(DEBUG):
+            event_log.log(DEBUG, "power_flow", "Power flow with {method}", method=method.name, redone=redone)
+        return node_voltages
+
+    def run_power_flow_method(self, options: dict) -> np.ndarray:
+        """Run the power flow with the given solver options. Returns the node voltages [p.u.]."""
+        output_data = call_timed(
+            self.profiler, f"electric_grid.calculate_power_flow.{options['calculation_method'].name}",
+            partial(self.model.calculate_power_flow, **options),
+        )
+        return output_data[ComponentType.node]["u_pu"]
+
+    def power_flow_options(self) -> dict:
+        """Get the solver options of exact power flows, e.g. of batch power flows (none without a solver policy)."""
+        return self.solver_policy.options() if self.solver_policy is not None else {}
+
+    def statistics(self) -> dict:
+        """Count the held steps, the power flow cache lookups (of all engines sharing the cache) and the power flows
+        per solver method, of the enabled options and over all runs of the engine."""
+        statistics = {}
+        if self.recompute_threshold is not None:
+            statistics["held_steps"] = self.held_steps
+        if self.power_flow_cache is not None:
+            statistics["power_flow_cache_hits"] = self.power_flow_cache.hits
+            statistics["power_flow_cache_misses"] = self.power_flow_cache.misses
+        if self.solver_policy is not None:
+            for method, count in self.solver_policy.summary().items():
+                statistics[f"{method}_power_flows"] = count
+            statistics["redone_power_flows"] = self.solver_policy.redone
+        return statistics
+
+    def update_loads(self, active_power: np.ndarray):
+        """Update the active and reactive power of the loads of the power grid model."""
+        self.sym_load_update["p_specified"] = active_power
+        self.sym_load_update["q_specified"] = calculate_reactive_power_from_active_power(active_power)
+        self.model.update(update_data={ComponentType.sym_load: self.sym_load_update})
+
+
+if __name__ == "__main__":
+    # Run script as standalone with no interaction between the models ...
+    active_power_df = read_csv_cached("data/combined_active_power.csv", index_col=0, parse_dates=True)
+    grid_topology_df = read_csv_cached("data/grid_topology.csv")
+    final_time_step = pd.DatetimeIndex(["2025-01-31 23:45:00"])
 
-result=electric_grid_function(active_power_df,
-                       smart_consumer_power_setpoint=5000,
-                       grid_topology=grid_topology_df,
-                       time_step=final_time_step)
+    result=electric_grid_function(active_power_df,
+                           smart_consumer_power_setpoint=5000,
+                           grid_topology=grid_topology_df,
+                           time_step=final_time_step)
 
-smart_consumer_voltage = result["consumers"]["smart_consumer"]
+    smart_consumer_voltage = result["consumers"]["smart_consumer"]
 
-print(smart_consumer_voltage)
\ No newline at end of file
+    print(smart_consumer_voltage)
\ No newline at end of file
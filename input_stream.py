@@ -0,0 +1,231 @@
+"""Streaming of the exogenous inputs of the co-simulation in fixed-size windows of time steps.
+
+The exogenous inputs are the signals no model influences: the active power of the passive consumers (the dataset), the
+user status (occupancy schedule) and the outside temperature. An `ExogenousInputStream` reads them one window at a
+time and reads the next window ahead on a background thread while the current one is simulated, so only two windows
+are held in memory however long the horizon is. A dataset opened from the binary cache (see `dataset_cache`) is
+memory-mapped, so only the pages of those windows are read.
+
+Generated statuses are seeded per day, so every window can be regenerated on its own (e.g. when a run resumes from a
+checkpoint) and the statuses do not depend on the window size. The outside temperature repeats a daily profile unless a
+weather series is given.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+MINUTES_PER_DAY = 1440
+OUTSIDE_TEMPERATURE_PERIOD = 15  # Minutes between the samples of the outside temperature profile
+# Outside temperature [°C] of one day, every OUTSIDE_TEMPERATURE_PERIOD minutes: it rises from 0 to 15 twice a day
+DAILY_OUTSIDE_TEMPERATURE = np.tile(np.linspace(0, 15, num=48, endpoint=True), 2)
+
+
+def generate_daily_status(delta_t: int, rng: np.random.Generator = None, num_days: int = 31) -> np.ndarray:
+    """
+    Generates a status array where:
+      - 1 = user is away (cannot charge EV, different temperature limits).
+      - 0 = user is at home.
+
+    Args:
+        delta_t (int): Time step in minutes.
+        rng (np.random.Generator): Random generator for reproducible schedules (default: global NumPy random state).
+        num_days (int): Number of simulated days.
+
+    Returns:
+        np.ndarray: Status array for the entire simulation (`num_days` days).
+    """
+    return generate_status_ensemble(delta_t, 1, rng, num_days)[0]
+
+
+def generate_status_ensemble(
+    delta_t: int, num_members: int, rng: np.random.Generator = None, num_days: int = 31,
+) -> np.ndarray:
+    """
+    Generates `num_members` status arrays at once (see `generate_daily_status`), without a loop over the days.
+
+    Args:
+        delta_t (int): Time step in minutes.
+        num_members (int): Number of status arrays (ensemble members).
+        rng (np.random.Generator): Random generator for reproducible schedules (default: global NumPy random state).
+        num_days (int): Number of simulated days.
+
+    Returns:
+        np.ndarray: Status arrays with one row per member.
+    """
+    random_integers = rng.integers if rng is not None else np.random.randint
+    total_minutes = num_days * MINUTES_PER_DAY
+    time_steps = total_minutes // delta_t  # Convert to simulation steps
+    start_of_day = np.arange(num_days) * MINUTES_PER_DAY  # Start minute of each day
+
+    # Generate random leave (5 AM - 6 AM) and return (5 PM - 6 PM) times for every member and day
+    leave_time = start_of_day + random_integers(300, 360, size=(num_members, num_days))
+    return_time = start_of_day + random_integers(1020, 1080, size=(num_members, num_days))
+
+    # Convert to time step indices
+    leave_step = np.minimum(leave_time // delta_t, time_steps - 1)
+    return_step = np.minimum(return_time // delta_t, time_steps - 1)
+
+    # Set status to 1 (away) between leaving and returning: mark both edges and accumulate them over time
+    edges = np.zeros((num_members, time_steps + 1), dtype=int)
+    members = np.arange(num_members)[:, np.newaxis]
+    np.add.at(edges, (members, leave_step), 1)
+    np.add.at(edges, (members, return_step), -1)
+    return np.cumsum(edges[:, :time_steps], axis=1)
+
+
+class ExogenousInputStream:
+    """The exogenous inputs of a co-simulation run, read in windows of `window_steps` time steps.
+
+    A window is a dictionary with its first and last (exclusive) time step ("start_step" and "end_step") and, for its
+    time steps:
+      - "active_power": the rows of the dataset covering the window, as a data frame;
+      - "dataset_times": the dataset time stamp of every time step (the row at, or last before, the simulation time);
+      - "status": the user status, with one row per household if multiple households are simulated;
+      - "outside_temperature": the outside temperature [°C], interpolated in time.
+    """
+
+    def __init__(
+        self,
+        active_power_df: "pd.DataFrame",
+        delta_t: int,
+        time_steps: int,
+        window_steps: int = None,
+        status: np.ndarray = None,
+        num_households: int = None,
+        status_seed: int = None,
+        outside_temperature: np.ndarray = None,
+        read_ahead: bool = True,
+    ):
+        """Initialize the stream.
+
+        Args:
+            active_power_df (pd.DataFrame): Active power of the passive consumers (e.g. memory-mapped from the cache).
+            delta_t (int): Time step [minutes].
+            time_steps (int): Number of time steps of the run.
+            window_steps (int): Time steps per window (default: the whole horizon in one window).
+            status (np.ndarray): User status per time step, with one row per household for multiple households
+                (default: generated per day).
+            num_households (int): Number of households to generate a status for (default: one status array).
+            status_seed (int): Seed of the generated statuses (default: drawn from the global NumPy random state).
+            outside_temperature (np.ndarray): Outside temperature [°C] every `OUTSIDE_TEMPERATURE_PERIOD` minutes from
+                the start (default: `DAILY_OUTSIDE_TEMPERATURE`, repeated every day).
+            read_ahead (bool): Read the next window on a background thread while the current one is used.
+        """
+        window_steps = time_steps if window_steps is None else window_steps
+        if window_steps <= 0:
+            raise ValueError(f"Window size must be positive, not {window_steps} time steps.")
+        if status is not None and status.shape[-1] < time_steps:
+            raise ValueError(f"The status has {status.shape[-1]} time steps, the run {time_steps}.")
+
+        self.delta_t = delta_t
+        self.time_steps = time_steps
+        self.window_steps = window_steps
+        self.status = status
+        self.num_households = num_households
+        self.status_seed = int(np.random.randint(2 ** 31)) if status_seed is None and status is None else status_seed
+        self.outside_temperature = outside_temperature
+        self.read_ahead = read_ahead
+
+        # Plain array views of the dataset, so a window is read by slicing them (and a memory map only reads the
+        # pages of the window).
+        self.dataset_values = active_power_df.to_numpy()
+        self.dataset_index = active_power_df.index
+        self.dataset_columns = active_power_df.columns
+        self.dataset_period = delta_t
+        if len(self.dataset_index) > 1:
+            self.dataset_period = (self.dataset_index[1] - self.dataset_index[0]) / np.timedelta64(1, 'm')
+        if time_steps * delta_t > len(self.dataset_index) * self.dataset_period:
+            raise ValueError(
+                f"The dataset covers {len(self.dataset_index) * self.dataset_period:g} minutes, the run "
+                f"{time_steps * delta_t} minutes ({time_steps} time steps of {delta_t} minutes)."
+            )
+
+    def windows(self, first_step: int = 0):
+        """Iterate over the windows of the run, starting at the time step `first_step` (within its window)."""
+        window_bounds = [
+            (max(start, first_step), min(start + self.window_steps, self.time_steps))
+            for start in range(first_step - first_step % self.window_steps, self.time_steps, self.window_steps)
+        ]
+        if not self.read_ahead:
+            for start_step, end_step in window_bounds:
+                yield self.read_window(start_step, end_step)
+            return
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="inputs") as executor:
+            future = executor.submit(self.read_window, *window_bounds[0]) if window_bounds else None
+            for next_bounds in window_bounds[1:] + [None]:
+                window = future.result()
+                if next_bounds is not None:
+                    future = executor.submit(self.read_window, *next_bounds)
+                yield window
+
+    def read_window(self, start_step: int, end_step: int) -> dict:
+        """Read the inputs of the time steps from `start_step` up to (not including) `end_step`."""
+        step_minutes = np.arange(start_step, end_step) * self.delta_t
+        dataset_rows = np.minimum(
+            (step_minutes // self.dataset_period).astype(np.int64), len(self.dataset_index) - 1,
+        )
+        first_row, end_row = dataset_rows[0], dataset_rows[-1] + 1
+        import pandas as pd  # The dataset is a data frame already, so this only looks up the loaded module
+
+        active_power = pd.DataFrame(
+            np.array(self.dataset_values[first_row:end_row]),  # Copied, so the pages are read here
+            index=self.dataset_index[first_row:end_row], columns=self.dataset_columns, copy=False,
+        )
+        return {
+            "start_step": start_step,
+            "end_step": end_step,
+            "active_power": active_power,
+            "dataset_times": self.dataset_index[dataset_rows],
+            "status": self.read_status(start_step, end_step),
+            "outside_temperature": self.read_outside_temperature(step_minutes),
+        }
+
+    def read_status(self, start_step: int, end_step: int) -> np.ndarray:
+        """Get the status of the time steps, generating the status of the days they cover if none was given.
+
+        The leave and return times of every day (see `generate_status_ensemble`) are drawn from a generator seeded with
+        the status seed and the day.
+        """
+        if self.status is not None:
+            return np.array(self.status[..., start_step:end_step])
+
+        num_members = self.num_households or 1
+        first_day = start_step * self.delta_t // MINUTES_PER_DAY
+        end_day = -(-end_step * self.delta_t // MINUTES_PER_DAY)
+        leave_time = np.empty((num_members, end_day - first_day), dtype=np.int64)
+        return_time = np.empty((num_members, end_day - first_day), dtype=np.int64)
+        for day in range(first_day, end_day):
+            rng = np.random.default_rng([self.status_seed, day])
+            leave_time[:, day - first_day] = day * MINUTES_PER_DAY + rng.integers(300, 360, size=num_members)
+            return_time[:, day - first_day] = day * MINUTES_PER_DAY + rng.integers(1020, 1080, size=num_members)
+
+        # Away (1) from the leave step up to the return step, in time steps from the start of the window
+        num_steps = end_step - start_step
+        leave_step = np.clip(leave_time // self.delta_t - start_step, 0, num_steps)
+        return_step = np.clip(return_time // self.delta_t - start_step, 0, num_steps)
+        edges = np.zeros((num_members, num_steps + 1), dtype=int)
+        members = np.arange(num_members)[:, np.newaxis]
+        np.add.at(edges, (members, leave_step), 1)
+        np.add.at(edges, (members, return_step), -1)
+        status = np.cumsum(edges[:, :num_steps], axis=1)
+        return status if self.num_households is not None else status[0]
+
+    def read_outside_temperature(self, step_minutes: np.ndarray) -> np.ndarray:
+        """Get the outside temperature at the given minutes from the start."""
+        if self.outside_temperature is None:
+            # Interpolate within the day, wrapping around to the start of the next day
+            profile_minutes = np.arange(len(DAILY_OUTSIDE_TEMPERATURE) + 1) * OUTSIDE_TEMPERATURE_PERIOD
+            profile = np.append(DAILY_OUTSIDE_TEMPERATURE, DAILY_OUTSIDE_TEMPERATURE[0])
+            return np.interp(step_minutes % MINUTES_PER_DAY, profile_minutes, profile)
+
+        # Only the samples around the window are read
+        last_sample = len(self.outside_temperature) - 1
+        first = min(int(step_minutes[0] // OUTSIDE_TEMPERATURE_PERIOD), last_sample)
+        end = min(int(step_minutes[-1] // OUTSIDE_TEMPERATURE_PERIOD) + 2, last_sample + 1)
+        sample_minutes = np.arange(first, end) * OUTSIDE_TEMPERATURE_PERIOD
+        return np.interp(step_minutes, sample_minutes, self.outside_temperature[first:end])
@@ -4,10 +4,19 @@ import os
 import pandas as pd
 import yaml
 
+from dataset_cache import read_csv_cached
+
 
 def load_configurations(configurations_folder_path: str, use_forecasted: bool) -> tuple[dict, list[dict[str, dict]]]:
-    """Load configurations from YAML files in the specified folder path."""
+    """Load configurations from YAML files in the specified folder path, and the dataset."""
+    controller_configuration, initialization_configurations = load_configuration_files(configurations_folder_path)
+    df = load_dataset(use_forecasted)
+
+    return controller_configuration, initialization_configurations, df
+
 
+def load_configuration_files(configurations_folder_path: str) -> tuple[dict, dict[str, dict]]:
+    """Load the controller configuration and the simulation configurations (by config id) from the YAML files."""
     config_files = [f for f in os.listdir(configurations_folder_path) if f.endswith('.yaml')]
     initialization_configurations = {}
 
@@ -25,12 +34,13 @@ def load_configurations(configurations_folder_path: str, use_forecasted: bool) -
                 raise KeyError(f"Configuration file {config_file} is missing the 'config_id' key.") from e
             initialization_configurations[f"config {config_id}"] = config_data
 
+    return controller_configuration, initialization_configurations
+
+
+def load_dataset(use_forecasted: bool) -> pd.DataFrame:
+    """Load the original or forecasted active power dataset."""
     dataset_file = "combined_active_power_forecasted.csv" if use_forecasted else "combined_active_power.csv"
     dataset_path = os.path.join('./data', dataset_file)
 
-    try:
-        df = pd.read_csv(dataset_path, index_col="snapshots", parse_dates=True)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Dataset file {dataset_path} not found.")
-
-    return controller_configuration, initialization_configurations, df
\ No newline at end of file
+    # The dataset is parsed once and afterwards opened memory-mapped from the binary cache.
+    return read_csv_cached(dataset_path, index_col="snapshots", parse_dates=True)
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""Open-loop pre-screening of the electricity grid model with batch power flows."""
+import numpy as np
+import pandas as pd
+from power_grid_model import ComponentType, DatasetType, initialize_array
+
+from event_log import DEBUG, get_event_log
+from grid import ElectricGridEngine, calculate_reactive_power_from_active_power
+from profiling import call_timed
+
+
+class PreScreenedGridModel:
+    """An electricity grid model that only runs exact power flows where the voltage can leave the voltage band.
+
+    The dataset is screened in blocks of `batch_size` rows, as the run reaches them, so only the rows of the simulated
+    horizon are screened. The voltages of every row of a block are computed open-loop, in batch power flows: once with
+    all smart consumers at the lowest and once at the highest power setpoint of `setpoint_range`. A row is flagged if
+    a smart consumer voltage of either bound is within `voltage_margin` of the `minimum_voltage`/`maximum_voltage`
+    bounds, and the flags are widened by `guard_steps` rows on both sides.
+
+    In the closed loop, an exact power flow (of `exact_model`) is run at flagged rows and whenever a setpoint is
+    outside `setpoint_range`. Elsewhere the voltages are interpolated between both bounds, by the share of the range
+    covered by the mean setpoint of the smart consumers.
+
+    The screening assumes the source voltage of the grid engine at the time of the screening. Source voltage changes
+    of up to `source_voltage_tolerance` (e.g. of the substation voltage of a `district`) are applied to the
+    interpolated voltages to first order, and widen the margin of the flags by the change. A block is screened again
+    for larger changes, and when the dataset changes (e.g. the next window of a streamed dataset).
+
+    The model is called with the same arguments as `electric_grid_function` and returns the same dictionary.
+    """
+
+    def __init__(
+        self,
+        controller_settings: dict,
+        setpoint_range: tuple[float, float],
+        grid_engine: ElectricGridEngine = None,
+        exact_model=None,
+        voltage_margin: float = 0.01,
+        guard_steps: int = 1,
+        batch_size: int = 4096,
+        source_voltage_tolerance: float = 0.01,
+    ):
+        """Initialize the pre-screened model.
+
+        Args:
+            controller_settings (dict): Controller configuration with the voltage boundary conditions.
+            setpoint_range (tuple): Lowest and highest smart consumer power setpoint of the screening [W].
+            grid_engine (ElectricGridEngine): Engine used for the batch power flows (a new one by default).
+            exact_model: Grid model used at flagged rows, e.g. a `VoltageSensitivitySurrogate` of the engine
+                (default: the power flows of the grid engine).
+            voltage_margin (float): Distance to the voltage bounds [p.u.] below which a row is flagged.
+            guard_steps (int): Rows flagged before and after every flagged row.
+            batch_size (int): Dataset rows per screened block (and batch calculation).
+            source_voltage_tolerance (float): Change of the source voltage [p.u.] up to which a screened block is
+                still used.
+        """
+        boundary_conditions = controller_settings['ControllerSettings']['boundary_conditions']
+        self.voltage_min = boundary_conditions['minimum_voltage']
+        self.voltage_max = boundary_conditions['maximum_voltage']
+
+        self.grid_engine = grid_engine if grid_engine is not None else ElectricGridEngine()
+        self.exact_model = exact_model
+        self.setpoint_range = (float(setpoint_range[0]), float(setpoint_range[1]))
+        if self.setpoint_range[0] >= self.setpoint_range[1]:
+            raise ValueError(f"Setpoint range {setpoint_range} is not increasing.")
+        self.voltage_margin = voltage_margin
+        self.guard_steps = guard_steps
+        self.batch_size = batch_size
+        self.source_voltage_tolerance = source_voltage_tolerance
+
+        # Screening of the current block of dataset rows, filled in by `screen`
+        self.screened_df = None
+        self.screened_source_voltage = None
+        self.screened_rows = (0, 0)  # First and last (exclusive) dataset row of the block
+        self.bound_voltages = None  # Node voltages at the lowest and highest setpoint, one row per row of the block
+        # Smallest distance of the smart consumer voltages to the voltage bounds [p.u.] per row of the block, over the
+        # rows within the guard steps
+        self.bound_distances = None
+
+        # Counters
+        self.exact_steps = 0
+        self.screened_steps = 0
+
+    def statistics(self) -> dict:
+        """Count the exact and the screened steps, with the statistics of the exact model (or the grid engine)."""
+        exact_model = self.exact_model if hasattr(self.exact_model, "statistics") else self.grid_engine
+        return {"exact_steps": self.exact_steps, "screened_steps": self.screened_steps, **exact_model.statistics()}
+
+    @property
+    def profiler(self):
+        """Profiler timing the parts of a step (shared with the grid engine)."""
+        return self.grid_engine.profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self.grid_engine.profiler = profiler
+
+    def __call__(
+        self,
+        active_power_df: pd.DataFrame,
+        smart_consumer_power_setpoint: float,
+        grid_topology: pd.DataFrame,
+        time_step: pd.DatetimeIndex,
+    ) -> dict[str, float]:
+        """Get the voltages for one time step, running an exact power flow only where the screening flagged it."""
+        engine = self.grid_engine
+        active_power = call_timed(
+            self.profiler, "electric_grid.data_prep", engine.consumer_active_power,
+            active_power_df, smart_consumer_power_setpoint, grid_topology, time_step,
+        )
+        row = engine.time_step_position(time_step)
+        source_voltage = self.source_voltage()
+        first_row, end_row = self.screened_rows
+        if (
+            active_power_df is not self.screened_df
+            or not first_row <= row < end_row
+            or abs(source_voltage - self.screened_source_voltage) > self.source_voltage_tolerance
+        ):
+            call_timed(self.profiler, "electric_grid.screen", self.screen, active_power_df, row)
+        source_voltage_change = source_voltage - self.screened_source_voltage
+        block_row = row - self.screened_rows[0]
+
+        setpoint = np.asarray(smart_consumer_power_setpoint, dtype=float)
+        lowest_setpoint, highest_setpoint = self.setpoint_range
+        if (
+            self.bound_distances[block_row] < self.voltage_margin + abs(source_voltage_change)
+            or np.any(setpoint < lowest_setpoint) or np.any(setpoint > highest_setpoint)
+        ):
+            self.exact_steps += 1
+            if self.exact_model is not None:
+                return self.exact_model(active_power_df, smart_consumer_power_setpoint, grid_topology, time_step)
+            return engine.voltages_dictionary(time_step, engine.update_power_flow(active_power))
+
+        self.screened_steps += 1
+        share = (setpoint.mean() - lowest_setpoint) / (highest_setpoint - lowest_setpoint)
+        low_voltages, high_voltages = self.bound_voltages[:, block_row]
+        node_voltages = low_voltages + share * (high_voltages - low_voltages)
+        if source_voltage_change != 0:
+            # First-order change of the voltages with the source voltage, for constant power loads
+            node_voltages = node_voltages + source_voltage_change * node_voltages / (
+                2 * node_voltages - self.screened_source_voltage
+            )
+        return engine.voltages_dictionary(time_step, node_voltages)
+
+    def source_voltage(self) -> float:
+        """Get the source voltage of the grid engine [p.u.]."""
+        source_voltage = self.grid_engine.source_voltage
+        return 1.0 if source_voltage is None else source_voltage  # The reference voltage of the topology
+
+    def screen(self, active_power_df: pd.DataFrame, first_row: int = 0):
+        """Compute the voltages of a block of dataset rows, from `first_row`, at both setpoint bounds, and the distance
+        of the smart consumer voltages to the voltage bounds.
+
+        The grid engine must be prepared for the dataset (see `ElectricGridEngine.consumer_active_power`).
+        """
+        engine = self.grid_engine
+        num_rows = len(engine.active_power)
+        end_row = min(first_row + self.batch_size, num_rows)
+        # The rows within the guard steps of the block are screened as well
+        first_guard_row = max(first_row - self.guard_steps, 0)
+        end_guard_row = min(end_row + self.guard_steps, num_rows)
+        guard_active_power = engine.active_power[first_guard_row:end_guard_row]
+
+        bound_voltages = []
+        for setpoint in self.setpoint_range:
+            batch_active_power = guard_active_power.copy()
+            batch_active_power[:, engine.smart_consumer_columns] = setpoint
+            sym_load_update = initialize_array(DatasetType.update, ComponentType.sym_load, batch_active_power.shape)
+            sym_load_update["id"] = engine.sym_load_update["id"]
+            sym_load_update["p_specified"] = batch_active_power
+            sym_load_update["q_specified"] = calculate_reactive_power_from_active_power(batch_active_power)
+            output_data = engine.model.calculate_power_flow(
+                update_data={ComponentType.sym_load: sym_load_update}, **engine.power_flow_options(),
+            )
+            bound_voltages.append(output_data[ComponentType.node]["u_pu"])
+        bound_voltages = np.stack(bound_voltages)
+
+        smart_consumer_voltages = bound_voltages[:, :, engine.smart_consumer_node_positions]
+        distances = np.minimum(
+            smart_consumer_voltages - self.voltage_min, self.voltage_max - smart_consumer_voltages,
+        ).min(axis=(0, 2))
+
+        # Widen the distances by the guard steps on both sides
+        guarded_distances = distances.copy()
+        for shift in range(1, self.guard_steps + 1):
+            guarded_distances[shift:] = np.minimum(guarded_distances[shift:], distances[:-shift])
+            guarded_distances[:-shift] = np.minimum(guarded_distances[:-shift], distances[shift:])
+
+        block = slice(first_row - first_guard_row, end_row - first_guard_row)
+        self.bound_voltages = bound_voltages[:, block]
+        self.bound_distances = guarded_distances[block]
+        self.screened_rows = (first_row, end_row)
+        self.screened_df = active_power_df
+        self.screened_source_voltage = self.source_voltage()
+
+        get_event_log().log(
+            DEBUG, "grid_screened", "Pre-screened rows {first_row} to {end_row}, {flagged} flagged",
+            first_row=first_row, end_row=end_row, flagged=int((self.bound_distances < self.voltage_margin).sum()),
+        )
@@ -0,0 +1,120 @@
+"""Timing and profiling of the co-simulation models.
+
+A `Profiler` collects the wall time of every call of a named section (a model, or a part of one). The Manager and the
+grid models only time their sections if a profiler is attached, so profiling costs one attribute check when disabled.
+"""
+import json
+import threading
+from array import array
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class Profiler:
+    """Collects call counts and wall times per section, and the number of simulated steps."""
+
+    def __init__(self):
+        self.start_times = {}  # Start time of every call per section [s]
+        self.durations = {}  # Duration of every call per section [s]
+        self.thread_ids = {}  # Thread of every call per section (`threading.get_ident`)
+        self.steps = 0
+        self.run_time = 0.0  # Wall time of all simulation runs [s]
+        self.counters = {}  # Counters of the models, e.g. of the power flows of the grid model
+
+    def add(self, section: str, start_time: float, duration: float):
+        """Add one call of a section, given its start time and duration from `time.perf_counter`, made by the
+        current thread."""
+        if section not in self.durations:
+            self.start_times[section] = array('d')
+            self.durations[section] = array('d')
+            self.thread_ids[section] = array('Q')
+        self.start_times[section].append(start_time)
+        self.durations[section].append(duration)
+        self.thread_ids[section].append(threading.get_ident())
+
+    def timed(self, section: str, function, *args):
+        """Call a function and add the call to the section."""
+        start_time = perf_counter()
+        result = function(*args)
+        self.add(section, start_time, perf_counter() - start_time)
+        return result
+
+    def add_run(self, steps: int, run_time: float):
+        """Add a simulation run of a number of steps."""
+        self.steps += steps
+        self.run_time += run_time
+
+    def add_counters(self, counters: dict):
+        """Add the counts of a simulation run."""
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def steps_per_second(self) -> float:
+        """Simulated steps per second of wall time."""
+        return self.steps / self.run_time if self.run_time > 0 else float("nan")
+
+    def summary(self) -> "pd.DataFrame":
+        """Summarize the calls per section: count, total and share of the run time, and percentiles [ms].
+
+        Sections may be nested: the "electric_grid.*" parts are timed within the "electric_grid" model calls.
+        """
+        import pandas as pd  # Only imported when summarizing, so importing the framework does not load pandas
+
+        rows = {}
+        for section, durations in self.durations.items():
+            durations = np.frombuffer(durations, dtype=np.float64) if len(durations) else np.zeros(1)
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99]) * 1e3
+            rows[section] = {
+                "calls": len(self.durations[section]),
+                "total [s]": durations.sum(),
+                "share of run time": durations.sum() / self.run_time if self.run_time > 0 else float("nan"),
+                "mean [ms]": durations.mean() * 1e3,
+                "p50 [ms]": p50,
+                "p95 [ms]": p95,
+                "p99 [ms]": p99,
+                "max [ms]": durations.max() * 1e3,
+            }
+        return pd.DataFrame.from_dict(rows, orient="index").rename_axis("section")
+
+    def report(self):
+        """Print the summary and the overall throughput."""
+        import pandas as pd
+
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(self.summary().round(4))
+        print(f"{self.steps} steps in {self.run_time:.2f} s ({self.steps_per_second:.1f} steps/s)")
+        for name, value in self.counters.items():
+            print(f"{name}: {value}")
+
+    def write_summary(self, path: str):
+        """Write the summary as a CSV file."""
+        self.summary().to_csv(path)
+
+    def write_trace(self, path: str):
+        """Write all calls as a trace file in the Chrome trace event format (e.g. for chrome://tracing or Perfetto).
+
+        The calls of every thread (e.g. of the grid worker thread of a concurrent run) are on their own track.
+        """
+        events = []
+        tids = {}
+        for section, start_times in self.start_times.items():
+            for start_time, duration, thread_id in zip(start_times, self.durations[section], self.thread_ids[section]):
+                tid = tids.setdefault(thread_id, len(tids))
+                events.append({
+                    "name": section, "ph": "X", "pid": 0, "tid": tid, "ts": start_time * 1e6, "dur": duration * 1e6,
+                })
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def call_timed(profiler: Profiler, section: str, function, *args):
+    """Call a function, timing the call as the section if a profiler is given."""
+    if profiler is None:
+        return function(*args)
+    return profiler.timed(section, function, *args)
@@ -0,0 +1,175 @@
+"""Preallocated, columnar recorder for the co-simulation results.
+
+Every signal is recorded into a typed NumPy column with one row per time step. Without an output folder the columns
+are preallocated for the whole horizon in memory. With an output folder only a buffer of `chunk_size` rows is held in
+memory; full chunks are flushed to one `.npy` file per signal while the simulation runs, and a small JSON file tracks
+how many rows were written, so the results up to the last flush survive if the process dies.
+"""
+import copy
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+METADATA_FILE_NAME = "metadata.json"
+
+
+class ResultsRecorder:
+    """A recorder of co-simulation signals in preallocated columns, optionally streamed to disk in chunks."""
+
+    def __init__(self, time_steps: int, output_folder_path: str = None, chunk_size: int = 1024):
+        """Initialize the recorder.
+
+        Args:
+            time_steps (int): Number of time steps of the simulation.
+            output_folder_path (str): Folder to stream the results to (default: keep all results in memory).
+            chunk_size (int): Number of rows buffered in memory before they are flushed to disk.
+        """
+        self.time_steps = time_steps
+        self.output_folder_path = output_folder_path
+        self.buffer_size = chunk_size if output_folder_path is not None else time_steps
+        self.signals = {}  # Signal metadata: dtype, shape and (optionally) labels of the entries
+        self.buffers = {}
+        self.files = {}
+        self.rows_written = 0  # Rows flushed to disk
+        self.position = 0  # Next time step to record
+
+        if output_folder_path is not None:
+            os.makedirs(output_folder_path, exist_ok=True)
+
+    def register(self, name: str, shape: tuple = (), dtype=np.float64, labels: list[str] = None):
+        """Register a signal with values of the given shape per time step, e.g. one voltage per node."""
+        if name in self.signals:
+            raise ValueError(f"Signal {name} is already registered.")
+        if self.position > 0:
+            raise ValueError(f"Signal {name} must be registered before the first time step is recorded.")
+        shape = tuple(shape)
+        self.signals[name] = {"dtype": np.dtype(dtype).str, "shape": list(shape), "labels": labels}
+        self.buffers[name] = np.zeros((self.buffer_size, *shape), dtype=dtype)
+
+        if self.output_folder_path is not None:
+            self.files[name] = open_memmap(
+                os.path.join(self.output_folder_path, f"{name}.npy"), mode='w+', dtype=dtype,
+                shape=(self.time_steps, *shape),
+            )
+            self.write_metadata()
+
+    def record(self, **values):
+        """Record the values of the registered signals for the next time step."""
+        row = self.position - self.rows_written
+        for name, value in values.items():
+            self.buffers[name][row] = value
+        self.position += 1
+
+        if self.output_folder_path is not None and self.position - self.rows_written == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows to disk."""
+        if self.output_folder_path is None or self.position == self.rows_written:
+            return
+        rows = self.position - self.rows_written
+        for name, file in self.files.items():
+            file[self.rows_written:self.position] = self.buffers[name][:rows]
+            file.flush()
+        self.rows_written = self.position
+        self.write_metadata()
+
+    def write_metadata(self):
+        """Write the signal metadata and the number of rows written (via a temporary file, so it is never partial)."""
+        metadata = {"time_steps": self.time_steps, "rows_written": self.rows_written, "signals": self.signals}
+        metadata_path = os.path.join(self.output_folder_path, METADATA_FILE_NAME)
+        with open(metadata_path + ".tmp", 'w') as file:
+            json.dump(metadata, file)
+        os.replace(metadata_path + ".tmp", metadata_path)
+
+    def get_state(self) -> dict:
+        """Get the signals and the rows recorded so far, e.g. for a checkpoint.
+
+        Rows are never rewritten once recorded, so the state does not copy them: with an output folder it refers to
+        the rows flushed to that folder, and in memory it holds views of the recorded rows.
+        """
+        state = {"signals": copy.deepcopy(self.signals), "position": self.position}
+        if self.output_folder_path is not None:
+            self.flush()
+            state["output_folder_path"] = self.output_folder_path
+        else:
+            state["columns"] = {name: buffer[:self.position] for name, buffer in self.buffers.items()}
+        return state
+
+    def set_state(self, state: dict):
+        """Register the signals of a state from `get_state` and fill in its recorded rows, to continue recording.
+
+        If the rows of the state were streamed to the output folder of this recorder (e.g. when resuming an
+        interrupted run), its files are reopened and recording continues after the rows of the state.
+        """
+        rows = state["position"]
+        columns = state.get("columns")
+        if columns is None:
+            if self.output_folder_path is not None and os.path.samefile(
+                state["output_folder_path"], self.output_folder_path,
+            ):
+                self.reopen(state["signals"], rows)
+                return
+            columns = load_results(state["output_folder_path"])
+
+        for name, signal in state["signals"].items():
+            self.register(name, signal["shape"], signal["dtype"], signal["labels"])
+        for name, column in columns.items():
+            if self.output_folder_path is None:
+                self.buffers[name][:rows] = column[:rows]
+            else:
+                self.files[name][:rows] = column[:rows]
+                self.files[name].flush()
+        self.position = rows
+        if self.output_folder_path is not None:
+            self.rows_written = rows
+            self.write_metadata()
+
+    def reopen(self, signals: dict, rows: int):
+        """Reopen the signal files of the output folder to continue recording after the first `rows` rows."""
+        for name, signal in signals.items():
+            self.signals[name] = copy.deepcopy(signal)
+            self.buffers[name] = np.zeros((self.buffer_size, *signal["shape"]), dtype=signal["dtype"])
+            self.files[name] = open_memmap(os.path.join(self.output_folder_path, f"{name}.npy"), mode='r+')
+            if self.files[name].shape[0] != self.time_steps:
+                raise ValueError(f"Signal {name} in {self.output_folder_path} is not of a run of the same length.")
+        self.position = self.rows_written = rows
+        self.write_metadata()
+
+    def results(self) -> dict[str, np.ndarray]:
+        """Get the recorded columns, trimmed to the time steps recorded so far."""
+        if self.output_folder_path is None:
+            return {name: buffer[:self.position] for name, buffer in self.buffers.items()}
+        self.flush()
+        return load_results(self.output_folder_path)
+
+
+def load_results(output_folder_path: str) -> dict[str, np.ndarray]:
+    """Open results streamed to disk by a `ResultsRecorder`, memory-mapped and trimmed to the rows written."""
+    with open(os.path.join(output_folder_path, METADATA_FILE_NAME), 'r') as file:
+        metadata = json.load(file)
+
+    rows_written = metadata["rows_written"]
+    return {
+        name: np.load(os.path.join(output_folder_path, f"{name}.npy"), mmap_mode='r')[:rows_written]
+        for name in metadata["signals"]
+    }
+
+
+def save_results(results: dict[str, np.ndarray], output_folder_path: str, signals: dict = None):
+    """Save results (e.g. of a run recorded in memory) in the format of a `ResultsRecorder` output folder, with the
+    labels of the signal metadata `signals` (see `ResultsRecorder.signals`)."""
+    os.makedirs(output_folder_path, exist_ok=True)
+    signals_metadata = {}
+    for name, column in results.items():
+        column = np.asarray(column)
+        np.save(os.path.join(output_folder_path, f"{name}.npy"), column)
+        labels = (signals or {}).get(name, {}).get("labels")
+        signals_metadata[name] = {"dtype": column.dtype.str, "shape": list(column.shape[1:]), "labels": labels}
+
+    time_steps = len(results["times"])
+    metadata = {"time_steps": time_steps, "rows_written": time_steps, "signals": signals_metadata}
+    with open(os.path.join(output_folder_path, METADATA_FILE_NAME), 'w') as file:
+        json.dump(metadata, file)
@@ -0,0 +1,138 @@
+"""Headless comparison reports of two co-simulation runs.
+
+A report holds comparison statistics (computed for all signals at once) and a plot rendered to a file with the
+non-interactive Agg backend. Every series is decimated to the pixel width of the plot before rendering: per pixel
+column only the minimum and maximum sample are kept, so peaks and limit violations stay visible while year-long or
+fine-resolution runs render as fast as a short one.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+REPORT_SIGNALS = [
+    ("smart_consumer_voltage", "Voltage [p.u.]", 'blue'),
+    ("temperature", "Temperature [°C]", 'red'),
+    ("hp_power_setpoint", "Power Setpoint [kW]", 'green'),
+    ("heat_production", "Heat Production [kW]", 'orange'),
+    ("ev_power", "EV Power [kW]", 'purple'),
+]
+
+
+def decimate_min_max(x: np.ndarray, y: np.ndarray, num_bins: int) -> tuple[np.ndarray, np.ndarray]:
+    """Decimate a series to the minimum and maximum sample of each of `num_bins` equally sized bins, in time order.
+
+    Series with at most two samples per bin are returned as they are.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= 2 * num_bins:
+        return x, y
+
+    bin_size = -(-len(y) // num_bins)  # Ceiling division
+    num_bins = -(-len(y) // bin_size)
+    padded = np.full(num_bins * bin_size, np.nan)
+    padded[:len(y)] = y
+    bins = padded.reshape(num_bins, bin_size)
+
+    bin_starts = np.arange(num_bins) * bin_size
+    minimum = bin_starts + np.nanargmin(bins, axis=1)
+    maximum = bin_starts + np.nanargmax(bins, axis=1)
+    indices = np.unique(np.concatenate([minimum, maximum]))  # Sorted, so the series stays in time order
+    return x[indices], y[indices]
+
+
+def comparison_statistics(
+    original_results: dict, forecasted_results: dict, controller_configuration: dict = None,
+) -> pd.DataFrame:
+    """Compare two runs: one row per signal with the means, the RMSE and the maximum absolute deviation.
+
+    With the controller configuration, the time outside the voltage and temperature bands is added for both runs
+    [minutes]. Multi-household signals are compared over all households.
+    """
+    signals = [signal for signal, _, _ in REPORT_SIGNALS if signal in original_results and signal in forecasted_results]
+    num_steps = min(len(original_results["times"]), len(forecasted_results["times"]))
+
+    # One pass over all signals: rows are signals, columns are samples
+    original = np.stack([np.asarray(original_results[signal][:num_steps], dtype=float) for signal in signals])
+    forecasted = np.stack([np.asarray(forecasted_results[signal][:num_steps], dtype=float) for signal in signals])
+    original = original.reshape(len(signals), -1)
+    forecasted = forecasted.reshape(len(signals), -1)
+    deviation = forecasted - original
+
+    statistics = pd.DataFrame({
+        "original_mean": original.mean(axis=1),
+        "forecasted_mean": forecasted.mean(axis=1),
+        "rmse": np.sqrt(np.mean(deviation ** 2, axis=1)),
+        "max_deviation": np.abs(deviation).max(axis=1),
+    }, index=pd.Index(signals, name="signal"))
+
+    if controller_configuration is not None:
+        boundary_conditions = controller_configuration['ControllerSettings']['boundary_conditions']
+        bands = {
+            "smart_consumer_voltage": (boundary_conditions['minimum_voltage'], boundary_conditions['maximum_voltage']),
+            "temperature": (boundary_conditions['minimum_temperature'], boundary_conditions['maximum_temperature']),
+        }
+        times = np.asarray(original_results["times"])
+        delta_t = times[1] - times[0] if len(times) > 1 else 0.0
+        lower = np.array([bands.get(signal, (-np.inf, np.inf))[0] for signal in signals])[:, np.newaxis]
+        upper = np.array([bands.get(signal, (-np.inf, np.inf))[1] for signal in signals])[:, np.newaxis]
+        has_band = np.array([signal in bands for signal in signals])
+        # Samples per time step: the number of households for multi-household signals
+        samples_per_step = original.shape[1] / num_steps if num_steps else 1
+        for name, values in [("original", original), ("forecasted", forecasted)]:
+            samples_outside = ((values < lower) | (values > upper)).sum(axis=1)
+            statistics[f"{name}_minutes_outside"] = np.where(
+                has_band, samples_outside / samples_per_step * delta_t, np.nan,
+            )
+
+    return statistics
+
+
+def render_comparison(
+    original_results: dict, forecasted_results: dict, path: str, width: int = 1200, height: int = 1000, dpi: int = 100,
+):
+    """Render the original and forecasted signals to an image file (the format follows from the extension).
+
+    Multi-household signals are plotted as their mean over the households.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # Only imported when rendering
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(figure)
+    axs = figure.subplots(3, 2)
+    num_bins = max(1, width // 2)  # Pixel columns per subplot
+
+    for i, (signal, ylabel, color) in enumerate(REPORT_SIGNALS):
+        ax = axs[i // 2, i % 2]
+        for results, label, line_color, linestyle in [
+            (original_results, "Original", 'black', 'dashed'),
+            (forecasted_results, "Forecasted", color, 'solid'),
+        ]:
+            values = np.asarray(results[signal])
+            if values.ndim > 1:
+                values = values.mean(axis=1)
+            times, values = decimate_min_max(results["times"], values, num_bins)
+            ax.plot(times, values, color=line_color, linestyle=linestyle, linewidth=0.8, label=label)
+        ax.set_title(f"{signal.replace('_', ' ').title()} Over Time")
+        ax.set_ylabel(ylabel)
+        ax.legend()
+    axs[2, 1].set_axis_off()
+
+    figure.tight_layout()
+    figure.savefig(path)
+
+
+def write_report(
+    original_results: dict, forecasted_results: dict, report_folder_path: str, controller_configuration: dict = None,
+) -> pd.DataFrame:
+    """Write the comparison statistics (statistics.csv) and the plot (comparison.png) to a folder.
+
+    Returns:
+        pd.DataFrame: The comparison statistics.
+    """
+    os.makedirs(report_folder_path, exist_ok=True)
+    statistics = comparison_statistics(original_results, forecasted_results, controller_configuration)
+    statistics.to_csv(os.path.join(report_folder_path, "statistics.csv"))
+    render_comparison(original_results, forecasted_results, os.path.join(report_folder_path, "comparison.png"))
+    return statistics
@@ -1,25 +1,56 @@
 """Room model."""
+import numpy as np
 
 
 class RoomFunction:
     """A class to model the temperature of a room over time."""
-    def __init__(self, settings_configuration: dict):
-        """Initialize the Room with thermal properties and initial temperature."""
+    def __init__(self, settings_configuration: dict, num_rooms: int = None):
+        """Initialize the Room with thermal properties and initial temperature.
+
+        If `num_rooms` is given, the rooms of that many households are modelled at once: the state is held in arrays
+        and the room properties in the configuration may be lists with one value per room.
+        """
         config = settings_configuration
 
         # Store variables as class attributes to be tracked during the simulation
+        # Integration time step, replaced by the update period of the room when a run is scheduled (see `Model`)
         self.delta_t = config['InitializationSettings']['time']['delta_t']
         self.room_temp = config['InitializationSettings']['initial_conditions']['room']['temperature']
         self.outside_temp = config['InitializationSettings']['initial_conditions']['room']['outside_temperature']
         self.room_tc = config['InitializationSettings']['initial_conditions']['room']['thermal_capacitance']
         self.room_tr = config['InitializationSettings']['initial_conditions']['room']['thermal_resistance']
 
+        if num_rooms is not None:
+            self.room_temp = per_room_values(self.room_temp, num_rooms)
+            self.outside_temp = per_room_values(self.outside_temp, num_rooms)
+            self.room_tc = per_room_values(self.room_tc, num_rooms)
+            self.room_tr = per_room_values(self.room_tr, num_rooms)
+
     def __call__(self, heat_production_from_hp: float, temp :int) -> float:
         """
         Callable method to update the room temperature during the simulation."""
         # Calculate heat loss to the environment
         heat_loss = (self.room_temp - temp) / self.room_tr
 
-        # Update room temperature using the discrete-time equation
-        self.room_temp += self.delta_t * (heat_production_from_hp - heat_loss) / self.room_tc
-        return self.room_temp
\ No newline at end of file
+        # Update room temperature using the discrete-time equation (a new array for many rooms, so that returned
+        # temperatures are not changed by later steps)
+        self.room_temp = self.room_temp + self.delta_t * (heat_production_from_hp - heat_loss) / self.room_tc
+        return self.room_temp
+
+    def set_period(self, period: int):
+        """Integrate with the update period [minutes] of the model that runs the room."""
+        self.delta_t = period
+
+    def get_state(self) -> dict:
+        """Get the state of the room(s), e.g. for a checkpoint."""
+        return {"room_temp": np.copy(self.room_temp)}
+
+    def set_state(self, state: dict):
+        """Restore a state from `get_state`."""
+        room_temp = np.copy(state["room_temp"])
+        self.room_temp = room_temp if room_temp.ndim else room_temp.item()
+
+
+def per_room_values(value, num_rooms: int) -> np.ndarray:
+    """Broadcast a configuration value (a number or a list with one value per room) to an array of all rooms."""
+    return np.broadcast_to(np.asarray(value, dtype=float), (num_rooms,)).copy()
@@ -0,0 +1,121 @@
+"""Persistent, content-addressed cache of co-simulation results.
+
+A run is keyed by the SHA-256 hash of everything that determines its results: the initialization and controller
+configurations, the content of the dataset and of the grid topology file, the source code of the model modules, the
+seed of the random generator and the run options (e.g. the number of households). An entry is a results folder in the
+format of a `ResultsRecorder` (one `.npy` column per signal), opened memory-mapped on a hit.
+
+The cache has a size cap: after every new entry, the least recently used entries are evicted until the cache fits.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import hash_file
+from recorder import load_results, save_results
+
+# Modules whose code determines the results of a run
+MODEL_MODULES = [
+    "cosim_framework", "input_stream", "grid", "voltage_surrogate", "pre_screening", "heat_pump", "room", "ev",
+    "controller", "sweep",
+]
+
+
+class RunCache:
+    """A folder of cached run results with a size cap, evicting the least recently used entries."""
+
+    def __init__(self, folder_path: str, max_size: int = 1 << 30):
+        """Initialize the cache in a folder, holding at most `max_size` bytes of results."""
+        if max_size < 1:
+            raise ValueError(f"Run cache size must be positive, not {max_size}.")
+        self.folder_path = folder_path
+        self.max_size = max_size
+        os.makedirs(folder_path, exist_ok=True)
+
+    def get(self, key: str) -> dict[str, np.ndarray]:
+        """Get the results of a key (None if not cached), marking the entry as recently used."""
+        entry_path = os.path.join(self.folder_path, key)
+        if not os.path.isdir(entry_path):
+            return None
+        os.utime(entry_path)
+        return load_results(entry_path)
+
+    def put(self, key: str, results: dict[str, np.ndarray], signals: dict = None):
+        """Cache the results of a key, with the signal metadata (e.g. labels, see `ResultsRecorder.signals`), then
+        evict the least recently used entries beyond the size cap."""
+        entry_path = os.path.join(self.folder_path, key)
+        temporary_path = tempfile.mkdtemp(dir=self.folder_path, prefix=".tmp-")
+        try:
+            save_results(results, temporary_path, signals)
+            os.rename(temporary_path, entry_path)
+        except OSError:
+            # Another process already cached the same run.
+            if not os.path.isdir(entry_path):
+                raise
+        finally:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None):
+        """Remove the least recently used entries until the cache fits its size cap (never the entry `keep`)."""
+        entries = []
+        for key in os.listdir(self.folder_path):
+            entry_path = os.path.join(self.folder_path, key)
+            if key.startswith(".") or not os.path.isdir(entry_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_path))
+            entries.append((os.stat(entry_path).st_mtime_ns, key, size))
+
+        total_size = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if key != keep:
+                shutil.rmtree(os.path.join(self.folder_path, key), ignore_errors=True)
+                total_size -= size
+
+
+def run_key(
+    settings_configuration: dict,
+    controller_configuration: dict,
+    dataset: pd.DataFrame,
+    seed: int,
+    options: dict = None,
+) -> str:
+    """Get the cache key of a run: the hash of its configurations, inputs, model code, seed and options."""
+    sha256 = hashlib.sha256()
+    sha256.update(json.dumps({
+        "settings_configuration": settings_configuration,
+        "controller_configuration": controller_configuration,
+        "grid_topology": hash_file(settings_configuration['InitializationSettings']['grid_topology']),
+        "code_version": code_version(),
+        "seed": seed,
+        "options": options or {},
+    }, sort_keys=True, default=str).encode())
+    update_with_data_frame(sha256, dataset)
+    return sha256.hexdigest()
+
+
+def code_version(modules: list[str] = MODEL_MODULES) -> str:
+    """Hash the source files of the model modules."""
+    sha256 = hashlib.sha256()
+    for module in modules:
+        with open(importlib.util.find_spec(module).origin, 'rb') as file:
+            sha256.update(file.read())
+    return sha256.hexdigest()
+
+
+def update_with_data_frame(sha256, df: pd.DataFrame, chunk_rows: int = 1 << 16):
+    """Add the columns, index and values of a data frame to a hash, reading the values in chunks of rows."""
+    sha256.update(json.dumps([str(column) for column in df.columns]).encode())
+    index = df.index.to_numpy(dtype=str) if df.index.dtype == object else df.index.to_numpy()
+    sha256.update(np.ascontiguousarray(index).tobytes())
+    values = df.to_numpy()
+    for first_row in range(0, len(values), chunk_rows):
+        sha256.update(np.ascontiguousarray(values[first_row:first_row + chunk_rows]).tobytes())
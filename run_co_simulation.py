@@ -1,42 +1,127 @@
-"""Run the co-simulation."""
-from functools import partial
+"""Run the co-simulation (see `python cli.py run --help`)."""
+import argparse
+import os
+import shutil
+import sys
+
+import numpy as np
 
-from controller import controller_function
-from cosim_framework import Manager, Model
-from grid import electric_grid_function
-from heat_pump import heat_pump_function
+from cosim_framework import Manager, compare_results, load_checkpoint
+from event_log import VERBOSITY_LEVELS, EventLog, set_event_log
 from load_configurations import load_configurations
-from room import RoomFunction
-from ev import  adjust_power
-import argparse
-import pandas as pd
+from profiling import Profiler
+from run_cache import RunCache, run_key
+
+
+def run(args: argparse.Namespace) -> tuple[dict, dict]:
+    """Run the co-simulation from the parsed command line arguments.
+
+    Returns:
+        tuple: The results on the original dataset, and on the forecasted dataset (None unless `--use-forecasted`).
+    """
+    from sweep import build_models  # Imports the grid models (and the power grid model)
+
+    event_log = EventLog(VERBOSITY_LEVELS[args.verbosity], args.log_file, background=args.log_file is not None)
+    set_event_log(event_log)
+
+    # 1. Load configurations from the 'configurations' folder
+    configurations_folder_path = './configurations'
+    controller_config, settings_configs, dataset = load_configurations(configurations_folder_path, use_forecasted=False)
+
+    # 2. Create model instances by wrapping the functions with the Model class. Every run gets new models, so it
+    # starts from the initial state of the models whichever runs came before it (or were loaded from the run cache).
+    profiler = Profiler() if args.profile is not None else None
+
+    def new_manager(results_subfolder: str) -> Manager:
+        """Create a manager with new models, recording to a subfolder of the results folder (if any)."""
+        models = build_models(settings_configs["config 1"], controller_config, args.use_surrogate, args.households)
+        recording = {}
+        if args.results_folder is not None:
+            recording = {"results_folder_path": os.path.join(args.results_folder, results_subfolder),
+                         "record_consumer_voltages": True, "record_status": True}
+        return Manager(
+            models, settings_configs["config 1"], num_households=args.households, profiler=profiler,
+            checkpoint_folder_path=args.checkpoint_folder, concurrent=args.concurrent,
+            input_window_days=args.input_window_days, **recording,
+        )
+
+    # 3. Run co-simulation with the given configurations
+    manager = new_manager("original")
+
+    checkpoint_steps = set()
+    if args.checkpoint_every is not None:
+        time_settings = settings_configs["config 1"]['InitializationSettings']['time']
+        time_steps = int((time_settings['end_time'] - time_settings['start_time']) / time_settings['delta_t'])
+        checkpoint_steps.update(range(0, time_steps, args.checkpoint_every))
+    fork_steps = {args.fork_at} if args.fork_at is not None else set()
+    checkpoint = load_checkpoint(args.resume) if args.resume is not None else None
+
+    # Runs are only cached if they are reproducible (seeded) and neither checkpointed nor continued from a checkpoint
+    run_cache = None
+    if args.run_cache is not None:
+        if args.seed is None or checkpoint_steps or fork_steps or args.resume is not None:
+            print("Not using the run cache: runs are only cached with --seed and without checkpoints.")
+        else:
+            run_cache = RunCache(args.run_cache, args.run_cache_size * 2 ** 20)
+    run_options = {
+        "households": args.households, "use_surrogate": args.use_surrogate, "input_window_days": args.input_window_days,
+        "record_extra_signals": args.results_folder is not None,
+    }
 
+    def simulate(simulation_manager: Manager, simulation_dataset, **run_arguments) -> dict:
+        """Run the simulation on a dataset with a manager, or load its results from the run cache."""
+        key = None
+        if run_cache is not None:
+            key = run_key(settings_configs["config 1"], controller_config, simulation_dataset, args.seed, run_options)
+            results = run_cache.get(key)
+            if results is not None:
+                print(f"✅ Loaded the results from the run cache ({key[:12]}).")
+                if simulation_manager.results_folder_path is not None:
+                    shutil.copytree(os.path.join(run_cache.folder_path, key), simulation_manager.results_folder_path,
+                                    dirs_exist_ok=True)
+                return results
+        if args.seed is not None:
+            np.random.seed(args.seed)  # Same occupancy pattern for the original and the forecasted run
+        results = simulation_manager.run_simulation(simulation_dataset, **run_arguments)
+        if key is not None:
+            run_cache.put(key, results, simulation_manager.result_signals)
+        return results
 
+    original_results = simulate(
+        manager, dataset, checkpoint_steps=checkpoint_steps, checkpoint=checkpoint, fork_steps=fork_steps,
+    )
+    manager.store_results(original_results)
 
-# 1. Load configurations from the 'configurations' folder
-configurations_folder_path = './configurations'
-controller_config, settings_configs, dataset = load_configurations(configurations_folder_path,use_forecasted=False)
+    forecasted_results = None
+    if args.use_forecasted:
+        print("\n✅ Running forecasted simulation...")
+        _, _, forecasted_dataset = load_configurations(configurations_folder_path, use_forecasted=True)
+        fork_checkpoint = manager.checkpoints.get(args.fork_at)
+        if args.fork_at is not None and fork_checkpoint is None:
+            raise ValueError(f"No checkpoint at time step {args.fork_at} to fork from.")
+        forecasted_manager = new_manager("forecasted")
+        forecasted_manager.store_results(original_results)
+        if fork_checkpoint is not None:
+            forecasted_results = forecasted_manager.run_simulation(forecasted_dataset, checkpoint=fork_checkpoint)
+        else:
+            forecasted_results = simulate(forecasted_manager, forecasted_dataset)
+        if args.report is not None:
+            from reporting import write_report
 
-# 2. Create model instances by wrapping the functions with the Model class
-electric_grid_model = Model(electric_grid_function)
-ev = Model(adjust_power)
-heat_pump_model = Model(heat_pump_function)
-room_model = Model(RoomFunction(settings_configs["config 1"]))
-controller_model = Model(partial(controller_function, controller_settings=controller_config))
+            compare_results(original_results, forecasted_results, controller_config)
+            write_report(original_results, forecasted_results, args.report, controller_config)
+        else:
+            forecasted_manager.compare_results(forecasted_results)
 
-# 3. Run co-simulation with the given configurations
-models = [electric_grid_model, heat_pump_model, room_model,ev, controller_model]
-manager = Manager(models, settings_configs["config 1"])
+    if profiler is not None:
+        profiler.report()
+        profiler.write_summary(f"{args.profile}.csv")
+        profiler.write_trace(f"{args.profile}.json")
 
-original_results = manager.run_simulation(dataset)
-manager.store_results(original_results)
+    event_log.close()
+    return original_results, forecasted_results
 
-parser = argparse.ArgumentParser(description="Run co-simulation with dataset selection.")
-parser.add_argument("--use-forecasted", action="store_true", help="Use forecasted dataset instead of original dataset.")
-args = parser.parse_args()
 
-if args.use_forecasted:
-    print("\n✅ Running forecasted simulation...")
-    controller_config, settings_configs, forecasted_dataset = load_configurations(configurations_folder_path, use_forecasted=True)
-    forecasted_results = manager.run_simulation(forecasted_dataset)
-    manager.compare_results(forecasted_results)
+if __name__ == "__main__":
+    from cli import main as cli_main
+    cli_main(["run", *sys.argv[1:]])
@@ -0,0 +1,267 @@
+"""Run a sweep of co-simulation scenarios in parallel on a process pool.
+
+The sweep runs every loaded configuration, optionally combined with a grid of parameter values, e.g.:
+    python sweep.py --max-workers 4 \
+        --grid InitializationSettings.initial_conditions.room.thermal_capacitance=4000,5000,6000 \
+        --grid ControllerSettings.actions.p_change_for_voltage=50,70
+"""
+import argparse
+import copy
+import itertools
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from controller import controller_function, controller_function_array
+from cosim_framework import Manager, Model
+from event_log import QUIET, EventLog, set_event_log
+from ev import adjust_power, adjust_power_array, adjust_power_batch
+from grid import SMART_CONSUMER_NAMES, ElectricGridEngine, PowerFlowCache, SolverPolicy, compile_grid_topology
+from heat_pump import heat_pump_function
+from load_configurations import load_configuration_files, load_dataset
+from pre_screening import PreScreenedGridModel
+from room import RoomFunction
+from voltage_surrogate import VoltageSensitivitySurrogate
+
+_power_flow_caches = {}  # Power flow caches of this process by (size, resolution)
+
+
+def build_models(
+    settings_configuration: dict,
+    controller_configuration: dict,
+    use_surrogate: bool = False,
+    num_households: int = None,
+) -> list:
+    """Create fresh model instances for one co-simulation, in the order expected by the Manager.
+
+    The smart consumers are the `smart_consumers` of the configuration (default: `SMART_CONSUMER_NAMES`). With
+    `num_households`, the array-backed models are used for that many smart consumers (the first ones), to be run by a
+    Manager created with the same `num_households`. The grid topology of the configuration is compiled once and cached
+    on disk (see `compile_grid_topology`).
+    """
+    smart_consumer_names = settings_configuration['InitializationSettings'].get('smart_consumers', SMART_CONSUMER_NAMES)
+    if num_households is not None and not 1 <= num_households <= len(smart_consumer_names):
+        raise ValueError(
+            f"Cannot simulate {num_households} households: the grid has {len(smart_consumer_names)} smart consumers."
+        )
+    topology = compile_grid_topology(settings_configuration['InitializationSettings']['grid_topology'])
+    scheduling = settings_configuration['InitializationSettings'].get('scheduling') or {}
+    recompute_threshold = scheduling.get('grid_recompute_threshold')
+    power_flow_cache = get_power_flow_cache(settings_configuration)
+    solver_policy = get_solver_policy(settings_configuration, controller_configuration)
+    if num_households is not None:
+        grid_engine = ElectricGridEngine(
+            smart_consumer_names[:num_households], topology, recompute_threshold, power_flow_cache, solver_policy,
+        )
+        room_model = Model(RoomFunction(settings_configuration, num_rooms=num_households))
+        ev_model = Model(adjust_power_array, batch_model=adjust_power_batch)
+        controller_model = Model(partial(controller_function_array, controller_settings=controller_configuration))
+    else:
+        grid_engine = ElectricGridEngine(
+            smart_consumer_names, topology, recompute_threshold, power_flow_cache, solver_policy,
+        )
+        room_model = Model(RoomFunction(settings_configuration))
+        ev_model = Model(adjust_power, batch_model=adjust_power_batch)
+        controller_model = Model(partial(controller_function, controller_settings=controller_configuration))
+
+    grid_model = grid_engine
+    if use_surrogate:
+        grid_model = VoltageSensitivitySurrogate(controller_configuration, grid_engine)
+    pre_screening = settings_configuration['InitializationSettings'].get('pre_screening') or {}
+    if pre_screening.get('setpoint_range'):
+        grid_model = PreScreenedGridModel(
+            controller_configuration, pre_screening['setpoint_range'], grid_engine,
+            grid_model if use_surrogate else None, pre_screening.get('voltage_margin', 0.01),
+            pre_screening.get('guard_steps', 1),
+            source_voltage_tolerance=pre_screening.get('source_voltage_tolerance', 0.01),
+        )
+    electric_grid_model = Model(grid_model)
+    heat_pump_model = Model(heat_pump_function)
+    return [electric_grid_model, heat_pump_model, room_model, ev_model, controller_model]
+
+
+def get_power_flow_cache(settings_configuration: dict) -> PowerFlowCache:
+    """Get the power flow cache of the configuration (None if disabled).
+
+    The cache is shared by all scenarios run in this process with the same cache settings, so scenarios that replay
+    the same states reuse each other's power flows.
+    """
+    cache_settings = settings_configuration['InitializationSettings'].get('power_flow_cache') or {}
+    if not cache_settings.get('size'):
+        return None
+    size, resolution = cache_settings['size'], cache_settings.get('resolution', 1.0)
+    if (size, resolution) not in _power_flow_caches:
+        _power_flow_caches[(size, resolution)] = PowerFlowCache(size, resolution)
+    return _power_flow_caches[(size, resolution)]
+
+
+def get_solver_policy(settings_configuration: dict, controller_configuration: dict) -> SolverPolicy:
+    """Get the power flow solver policy of the configuration (None for the library defaults)."""
+    solver_settings = settings_configuration['InitializationSettings'].get('power_flow_solver')
+    if not solver_settings:
+        return None
+    boundary_conditions = controller_configuration['ControllerSettings']['boundary_conditions']
+    return SolverPolicy(
+        boundary_conditions['minimum_voltage'], boundary_conditions['maximum_voltage'], **solver_settings,
+    )
+
+
+def set_parameter(configurations: dict, parameter: str, value):
+    """Set a parameter given by its dotted path, e.g. "ControllerSettings.actions.p_change_for_voltage"."""
+    *keys, last_key = parameter.split(".")
+    section = configurations
+    for key in keys:
+        section = section[key]
+    if last_key not in section:
+        raise KeyError(f"Unknown sweep parameter {parameter}.")
+    section[last_key] = value
+
+
+def generate_scenarios(
+    settings_configurations: dict, controller_configuration: dict, parameter_grid: dict[str, list] = None,
+) -> list[dict]:
+    """Combine every configuration with every combination of the parameter grid.
+
+    Parameters are dotted paths into the initialization settings ("InitializationSettings. ...") or into the
+    controller configuration ("ControllerSettings. ...").
+    """
+    parameter_grid = parameter_grid or {}
+    parameters = list(parameter_grid)
+
+    scenarios = []
+    for config_name, settings_configuration in settings_configurations.items():
+        for values in itertools.product(*parameter_grid.values()):
+            # Both configurations have distinct top-level keys, so parameters can be set on their union.
+            configurations = copy.deepcopy({**settings_configuration, **controller_configuration})
+            for parameter, value in zip(parameters, values):
+                set_parameter(configurations, parameter, value)
+
+            scenarios.append({
+                "name": ", ".join([config_name] + [f"{p}={v}" for p, v in zip(parameters, values)]),
+                "config": config_name,
+                "parameters": dict(zip(parameters, values)),
+                "settings_configuration": {"InitializationSettings": configurations["InitializationSettings"]},
+                "controller_configuration": {"ControllerSettings": configurations["ControllerSettings"]},
+            })
+    return scenarios
+
+
+def run_scenario(scenario: dict, use_forecasted: bool = False, use_surrogate: bool = False, seed: int = 0) -> dict:
+    """Run one scenario with its own models and Manager. Meant to be run in a worker process."""
+    settings_configuration = scenario["settings_configuration"]
+    controller_configuration = scenario["controller_configuration"]
+    if seed is not None:
+        np.random.seed(seed)  # Same occupancy pattern for every scenario
+
+    set_event_log(EventLog(QUIET))  # Workers only report their results
+    start = time.perf_counter()
+    try:
+        dataset = load_dataset(use_forecasted)
+        models = build_models(settings_configuration, controller_configuration, use_surrogate)
+        manager = Manager(models, settings_configuration)
+        results = manager.run_simulation(dataset)
+    except Exception as e:
+        return {"name": scenario["name"], "error": repr(e), "results": None}
+
+    return {
+        "name": scenario["name"],
+        "error": None,
+        "runtime": time.perf_counter() - start,
+        "results": results,
+    }
+
+
+def summarize_results(results: dict, controller_configuration: dict) -> dict:
+    """Summarize the results of one scenario into a row of the sweep table."""
+    boundary_conditions = controller_configuration['ControllerSettings']['boundary_conditions']
+    voltage = np.asarray(results["smart_consumer_voltage"])
+    temperature = np.asarray(results["temperature"])
+    voltage_violation = (voltage < boundary_conditions['minimum_voltage']) | (
+        voltage > boundary_conditions['maximum_voltage']
+    )
+    temperature_violation = (temperature < boundary_conditions['minimum_temperature']) | (
+        temperature > boundary_conditions['maximum_temperature']
+    )
+    return {
+        "voltage_mean": voltage.mean(),
+        "voltage_min": voltage.min(),
+        "voltage_max": voltage.max(),
+        "voltage_violation_share": voltage_violation.mean(),
+        "temperature_mean": temperature.mean(),
+        "temperature_min": temperature.min(),
+        "temperature_max": temperature.max(),
+        "temperature_violation_share": temperature_violation.mean(),
+        "hp_power_setpoint_mean": np.mean(results["hp_power_setpoint"]),
+        "ev_power_mean": np.mean(results["ev_power"]),
+    }
+
+
+def run_sweep(
+    scenarios: list[dict],
+    max_workers: int = None,
+    use_forecasted: bool = False,
+    use_surrogate: bool = False,
+    seed: int = 0,
+) -> tuple[pd.DataFrame, dict]:
+    """Run all scenarios on a process pool with at most `max_workers` concurrent workers.
+
+    Returns:
+        tuple: Table with one summary row per scenario, and the full results keyed by scenario name.
+    """
+    worker = partial(run_scenario, use_forecasted=use_forecasted, use_surrogate=use_surrogate, seed=seed)
+    rows = []
+    all_results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for scenario, outcome in zip(scenarios, executor.map(worker, scenarios)):
+            row = {"name": scenario["name"], "config": scenario["config"], **scenario["parameters"]}
+            if outcome["error"] is not None:
+                print(f"Scenario {scenario['name']} failed: {outcome['error']}")
+                row["error"] = outcome["error"]
+            else:
+                row["runtime"] = outcome["runtime"]
+                row.update(summarize_results(outcome["results"], scenario["controller_configuration"]))
+                all_results[scenario["name"]] = outcome["results"]
+            rows.append(row)
+
+    return pd.DataFrame(rows).set_index("name"), all_results
+
+
+def parse_parameter_grid(grid_arguments: list[str]) -> dict[str, list]:
+    """Parse "parameter=value1,value2" arguments into a parameter grid."""
+    parameter_grid = {}
+    for argument in grid_arguments or []:
+        parameter, _, values = argument.partition("=")
+        parameter_grid[parameter] = [parse_value(value) for value in values.split(",")]
+    return parameter_grid
+
+
+def parse_value(value: str):
+    """Parse a parameter value as int or float where possible."""
+    for value_type in (int, float):
+        try:
+            return value_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main(args: argparse.Namespace):
+    """Run the sweep from the parsed command line arguments (see `python cli.py sweep --help`)."""
+    controller_config, settings_configs = load_configuration_files('./configurations')
+    sweep_scenarios = generate_scenarios(settings_configs, controller_config, parse_parameter_grid(args.grid))
+    print(f"Running {len(sweep_scenarios)} scenarios...")
+
+    sweep_table, _ = run_sweep(
+        sweep_scenarios, args.max_workers, args.use_forecasted, args.use_surrogate, args.seed,
+    )
+    sweep_table.to_csv(args.output)
+    print(sweep_table)
+
+
+if __name__ == "__main__":
+    from cli import main as cli_main
+    cli_main(["sweep", *sys.argv[1:]])
@@ -0,0 +1,174 @@
+"""Voltage-sensitivity surrogate of the electricity grid model."""
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from power_grid_model import ComponentType, DatasetType, initialize_array
+
+from event_log import DEBUG, get_event_log
+from grid import ElectricGridEngine, calculate_reactive_power_from_active_power
+from profiling import call_timed
+
+
+class VoltageSensitivitySurrogate:
+    """A surrogate electricity grid model that predicts voltages from dV/dP sensitivities.
+
+    The sensitivities of all node voltages to the active power of every load are computed around a reference power
+    flow (one batch power flow with each load perturbed in turn). Small load changes are then predicted linearly. An
+    exact power flow is run instead when:
+      - there is no valid reference: none yet, the loads moved more than `max_load_change` per load on average away
+        from the reference, or the estimated linearization error exceeds the `error_budget`;
+      - a predicted smart consumer voltage is within `voltage_margin` (plus the estimated error) of the
+        `minimum_voltage`/`maximum_voltage` bounds, so limit-violation decisions of the controller stay exact.
+
+    A linearization costs about as much as `linearization_cost` exact power flows, so it only pays back if the
+    reference stays valid for long enough. The surrogate therefore linearizes around the current power flow once the
+    exact power flows run for lack of a valid reference have cost as much as a linearization.
+
+    The surrogate is called with the same arguments as `electric_grid_function` and returns the same dictionary.
+    """
+
+    def __init__(
+        self,
+        controller_settings: dict,
+        grid_engine: ElectricGridEngine = None,
+        voltage_margin: float = 0.01,
+        error_budget: float = 1e-3,
+        max_load_change: float = 1e3,
+        perturbation: float = 100.0,
+        linearization_cost: float = None,
+    ):
+        """Initialize the surrogate.
+
+        Args:
+            controller_settings (dict): Controller configuration with the voltage boundary conditions.
+            grid_engine (ElectricGridEngine): Engine used for the exact power flows (a new one by default).
+            voltage_margin (float): Distance to the voltage bounds [p.u.] below which an exact power flow is run.
+            error_budget (float): Maximum estimated linearization error of a predicted voltage [p.u.].
+            max_load_change (float): Maximum mean absolute load change per load from the reference [W].
+            perturbation (float): Active power perturbation used to compute the sensitivities [W].
+            linearization_cost (float): Cost of a linearization in exact power flows (default: one per load).
+        """
+        boundary_conditions = controller_settings['ControllerSettings']['boundary_conditions']
+        self.voltage_min = boundary_conditions['minimum_voltage']
+        self.voltage_max = boundary_conditions['maximum_voltage']
+
+        self.grid_engine = grid_engine if grid_engine is not None else ElectricGridEngine()
+        self.voltage_margin = voltage_margin
+        self.error_budget = error_budget
+        self.max_load_change = max_load_change
+        self.perturbation = perturbation
+        self.linearization_cost = linearization_cost
+
+        # Linearization around the reference power flow
+        self.reference_power = None
+        self.reference_voltages = None
+        self.sensitivities = None  # dV/dP [p.u./W], one row per load and one column per node
+        self.error_coefficient = 0.0  # Observed linearization error per squared load change [p.u./W^2]
+        self.invalid_reference_power_flows = 0  # Exact power flows run for lack of a valid reference
+
+        # Counters
+        self.exact_power_flows = 0
+        self.surrogate_steps = 0
+        self.sensitivity_updates = 0
+
+    def statistics(self) -> dict:
+        """Count the exact power flows, the predicted steps and the linearizations, with those of the grid engine."""
+        return {
+            "exact_power_flows": self.exact_power_flows,
+            "surrogate_steps": self.surrogate_steps,
+            "sensitivity_updates": self.sensitivity_updates,
+            **self.grid_engine.statistics(),
+        }
+
+    @property
+    def profiler(self):
+        """Profiler timing the parts of a step (shared with the grid engine)."""
+        return self.grid_engine.profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self.grid_engine.profiler = profiler
+
+    def __call__(
+        self,
+        active_power_df: pd.DataFrame,
+        smart_consumer_power_setpoint: float,
+        grid_topology: pd.DataFrame,
+        time_step: pd.DatetimeIndex,
+    ) -> dict[str, float]:
+        """Predict the voltages for one time step, falling back to an exact power flow when needed."""
+        engine = self.grid_engine
+        model = engine.model
+        active_power = call_timed(
+            self.profiler, "electric_grid.data_prep", engine.consumer_active_power,
+            active_power_df, smart_consumer_power_setpoint, grid_topology, time_step,
+        )
+        if engine.model is not model:
+            self.reference_power = None  # The power grid model was rebuilt for another grid or other consumers
+
+        # 1. Without a valid reference, run an exact power flow, and linearize around it once that pays back.
+        if self.reference_power is not None:
+            load_change = active_power - self.reference_power
+            total_load_change = np.abs(load_change).sum()
+            estimated_error = self.error_coefficient * total_load_change ** 2
+            if total_load_change > self.max_load_change * len(active_power) or estimated_error > self.error_budget:
+                self.reference_power = None
+        if self.reference_power is None:
+            self.invalid_reference_power_flows += 1
+            linearization_cost = self.linearization_cost
+            if linearization_cost is None:
+                linearization_cost = len(active_power)
+            if self.invalid_reference_power_flows > linearization_cost:
+                return engine.voltages_dictionary(time_step, self.linearize(active_power))
+            return engine.voltages_dictionary(time_step, self.exact_power_flow(active_power))
+
+        # 2. Predict the voltages and only accept the prediction when it is safely within the voltage bounds.
+        node_voltages = self.reference_voltages + load_change @ self.sensitivities
+        smart_consumer_voltages = node_voltages[engine.smart_consumer_node_positions]
+        margin = self.voltage_margin + estimated_error
+        if np.all(smart_consumer_voltages >= self.voltage_min + margin) and np.all(
+            smart_consumer_voltages <= self.voltage_max - margin
+        ):
+            self.surrogate_steps += 1
+            return engine.voltages_dictionary(time_step, node_voltages)
+
+        # 3. Near the bounds: run an exact power flow and use it to calibrate the error estimate.
+        exact_voltages = self.exact_power_flow(active_power)
+        prediction_error = np.max(np.abs(exact_voltages[engine.smart_consumer_node_positions] - smart_consumer_voltages))
+        if total_load_change > 0:
+            self.error_coefficient = max(self.error_coefficient, prediction_error / total_load_change ** 2)
+        return engine.voltages_dictionary(time_step, exact_voltages)
+
+    def exact_power_flow(self, active_power: np.ndarray) -> np.ndarray:
+        """Run an exact power flow with the grid engine."""
+        self.exact_power_flows += 1
+        return self.grid_engine.update_power_flow(active_power)
+
+    def linearize(self, active_power: np.ndarray) -> np.ndarray:
+        """Run an exact reference power flow and compute the voltage sensitivities around it."""
+        node_voltages = self.exact_power_flow(active_power)
+
+        # Perturb the active power of each load in turn, all in one batch power flow.
+        num_loads = len(active_power)
+        batch_active_power = np.tile(active_power, (num_loads, 1)) + self.perturbation * np.eye(num_loads)
+        sym_load_update = initialize_array(DatasetType.update, ComponentType.sym_load, (num_loads, num_loads))
+        sym_load_update["id"] = self.grid_engine.sym_load_update["id"]
+        sym_load_update["p_specified"] = batch_active_power
+        sym_load_update["q_specified"] = calculate_reactive_power_from_active_power(batch_active_power)
+        batch_power_flow = partial(
+            self.grid_engine.model.calculate_power_flow, update_data={ComponentType.sym_load: sym_load_update},
+            **self.grid_engine.power_flow_options(),
+        )
+        output_data = call_timed(self.profiler, "electric_grid.linearize", batch_power_flow)
+
+        self.sensitivities = (output_data[ComponentType.node]["u_pu"] - node_voltages) / self.perturbation
+        self.reference_power = active_power
+        self.reference_voltages = node_voltages
+        self.invalid_reference_power_flows = 0
+        self.sensitivity_updates += 1
+        get_event_log().log(
+            DEBUG, "grid_linearized", "Updated voltage sensitivities ({sensitivity_updates} updates)",
+            sensitivity_updates=self.sensitivity_updates,
+        )
+        return node_voltages